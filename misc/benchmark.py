@@ -0,0 +1,252 @@
+"""Benchmarks for the engines and schedule expansion of pylan.
+
+Runs a set of representative workloads against the pylan checkout this file is in, and
+reports the time, throughput (ticks/s, events/s) and peak memory of every workload.
+
+python misc/benchmark.py --output before.json
+python misc/benchmark.py --compare before.json --budget 1.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pylan import (  # noqa: E402
+    Add,
+    CsvSink,
+    Engine,
+    Granularity,
+    Item,
+    Multiply,
+    Subtract,
+)
+from pylan.schedule import schedule_cache, timedelta_from_schedule  # noqa: E402
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+START = "2024-1-1"
+END = "2054-1-1"
+BENCHMARKS = {}
+
+
+def benchmark(name, requires_numpy=False):
+    """Registers a workload. A workload prepares a model and returns a function that runs
+    it (returning the number of ticks), and the number of events in that run."""
+
+    def register(workload):
+        if not requires_numpy or numpy is not None:
+            BENCHMARKS[name] = workload
+        return workload
+
+    return register
+
+
+def savings():
+    """The model from the readme, with a yearly gain on top."""
+    savings = Item(start_value=100)
+    salary_payments = Add("1m", 2500, offset="24d")
+    salary_payments.add_projection(Multiply("1y", 1.02))
+    savings.add_projections([salary_payments, Subtract("0 0 2 * *", 1500)])
+    savings.add_projection(Multiply("1y", 1.04))
+    return savings
+
+
+def count_events(item, granularity):
+    """Returns the number of times projections are applied between START and END."""
+    return len(item.timeline(START, END, granularity).ticks)
+
+
+def run_workload(item, granularity, engine=Engine.loop, dense=False):
+    """Returns a function that runs the item between START and END, and the events."""
+
+    def run():
+        return len(item.run(START, END, granularity, engine=engine, dense=dense))
+
+    return run, count_events(item, granularity)
+
+
+@benchmark("hourly_decades_loop")
+def hourly_decades_loop():
+    return run_workload(savings(), Granularity.hour)
+
+
+@benchmark("hourly_decades_event")
+def hourly_decades_event():
+    return run_workload(savings(), Granularity.hour, Engine.event, dense=True)
+
+
+@benchmark("hourly_decades_vector", requires_numpy=True)
+def hourly_decades_vector():
+    return run_workload(savings(), Granularity.hour, Engine.vector)
+
+
+@benchmark("many_cron_projections")
+def many_cron_projections():
+    item = Item(start_value=0)
+    for index in range(50):
+        cron = " ".join(str(field) for field in [index % 60, index % 24, index % 28 + 1])
+        item.add_projection(Add(cron + " * *", 1))
+    return run_workload(item, Granularity.day)
+
+
+@benchmark("deep_nested_projections")
+def deep_nested_projections():
+    item = Item(start_value=0)
+    salary = Add("1m", 2500)
+    parent = salary
+    for index in range(25):
+        child = Multiply(str(index % 12 + 1) + "m", 1.001)
+        parent.add_projection(child)
+        parent = child
+    item.add_projection(salary)
+    return run_workload(item, Granularity.day)
+
+
+@benchmark("schedule_expansion")
+def schedule_expansion():
+    start, end = datetime(2024, 1, 1), datetime(2124, 1, 1)
+    schedules = ["1d", ["2d", "5d"], "0 0 * * *", "0 */6 * * mon-fri", "1m"]
+
+    def run():
+        schedule_cache.clear()
+        return sum(len(timedelta_from_schedule(s, start, end)) for s in schedules)
+
+    return run, run()
+
+
+@benchmark("result_export")
+def result_export():
+    item = savings()
+
+    def run():
+        with tempfile.TemporaryDirectory() as directory:
+            result = item.run(START, END, Granularity.hour)
+            result.to_csv(os.path.join(directory, "result.csv"))
+            sink = CsvSink(os.path.join(directory, "sink.csv"))
+            item.run(START, END, Granularity.hour, sink=sink)
+        return len(result) + sink.rows
+
+    return run, 2 * count_events(item, Granularity.hour)
+
+
+@benchmark("until_far_target")
+def until_far_target():
+    item = Item(start_value=0)
+    item.add_projection(Add("1d", 1))
+
+    def run():
+        return item.until(100000, datetime(2024, 1, 1), max_iterations=200000).days
+
+    return run, 100000
+
+
+@benchmark("simulate_paths", requires_numpy=True)
+def simulate_paths():
+    from pylan import Normal
+
+    item = savings()
+    item.add_projection(Multiply("1m", Normal(1.005, 0.04)))
+    paths = 2000
+
+    def run():
+        simulation = item.simulate(paths, START, END, Granularity.day, seed=1)
+        simulation.bands()
+        return len(simulation) * paths
+
+    return run, count_events(item, Granularity.day) * paths
+
+
+def measure(workload, repeat):
+    """Returns the best time of a number of runs, and the peak memory of a traced run."""
+    run, events = workload()
+    seconds = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        ticks = run()
+        seconds.append(time.perf_counter() - begin)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    best = min(seconds)
+    return {
+        "seconds": round(best, 6),
+        "ticks": ticks,
+        "events": events,
+        "ticks_per_second": round(ticks / best, 1),
+        "events_per_second": round(events / best, 1),
+        "peak_memory_mb": round(peak / 2**20, 3),
+    }
+
+
+def compare(results, baseline, budget):
+    """Prints the change per workload, returns false if a workload exceeds the budget."""
+    within_budget = True
+    print(f"{'benchmark':28} {'before':>10} {'after':>10} {'ratio':>7}")
+    for name, result in results["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            print(f"{name:28} {'-':>10} {result['seconds']:>10.4f}")
+            continue
+        ratio = result["seconds"] / before["seconds"]
+        flag = ""
+        if budget and ratio > budget:
+            within_budget = False
+            flag = " over budget"
+        print(
+            f"{name:28} {before['seconds']:>10.4f} {result['seconds']:>10.4f} "
+            f"{ratio:>7.2f}{flag}"
+        )
+    return within_budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", help="write the results to a json file")
+    parser.add_argument("--compare", help="compare with the results in a json file")
+    parser.add_argument("--budget", type=float, help="max allowed slowdown (e.g. 1.2)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark")
+    parser.add_argument("--only", nargs="*", help="names of the benchmarks to run")
+    args = parser.parse_args()
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": numpy.__version__ if numpy is not None else None,
+        "benchmarks": {},
+    }
+    for name, workload in BENCHMARKS.items():
+        if args.only and name not in args.only:
+            continue
+        result = measure(workload, args.repeat)
+        results["benchmarks"][name] = result
+        print(
+            f"{name:28} {result['seconds']:>9.4f}s {result['ticks_per_second']:>14.0f} "
+            f"ticks/s {result['events_per_second']:>12.0f} events/s "
+            f"{result['peak_memory_mb']:>9.2f} MB"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.budget):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -55,6 +55,21 @@ A list of datetime objects or str that resemble datetime objects. For example, [
 
 **_NOTE:_**  The date format in pylan is yyyy-mm-dd. Currently this is not configurable.
 
+---
+
+## Breaking changes
+
+Runs no longer change the item, so the same item can be run from multiple threads at once. The run state (the current value, how often a projection was applied, etc) lives in a run context that is created for every run. This breaks code that relies on the item holding the run state:
+- Item.value and Item.iterations are removed. Use the result of a run, or Item.start_value for the start value.
+- Item.iterate() yields (date, context) instead of (date, item). The context has the current value, so `saved.value` keeps working.
+- Projections that are applied by hand while iterating are applied to the context: `buy_car.apply(saved)` instead of `buy_car.apply(savings)`.
+
+```python
+for date, saved in savings.iterate("2024-1-1", "2025-1-1", Granularity.day):
+    if saved.value > 5000 and not car_bought:
+        buy_car.apply(saved)
+        car_bought = True
+```
 """
 
 
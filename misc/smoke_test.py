@@ -13,6 +13,6 @@ buy_car = Subtract("", 5000)
 
 for date, saved in savings.iterate("2024-1-1", "2025-1-1", Granularity.day):
     if saved.value > 5000 and not car_bought:
-        buy_car.apply(savings)
+        buy_car.apply(saved)
         car_bought = True
     result.add_result(date=date, value=saved.value)
@@ -1,8 +1,31 @@
+from pylan.branch import Branch  # noqa: F401
+from pylan.context import RunContext  # noqa: F401
+from pylan.distributions import Distribution, LogNormal, Normal, Uniform  # noqa: F401
+from pylan.engine import Engine  # noqa: F401
 from pylan.granularity import Granularity  # noqa: F401
+from pylan.incremental import IncrementalRun  # noqa: F401
 from pylan.item import Item  # noqa: F401
+from pylan.output import Every, OnChange, Output, PeriodEnd, Sample  # noqa: F401
+from pylan.plan import Plan  # noqa: F401
+from pylan.portfolio import Portfolio, PortfolioResult  # noqa: F401
+from pylan.profiler import Profiler  # noqa: F401
 from pylan.projections.add import Add  # noqa: F401
 from pylan.projections.divide import Divide  # noqa: F401
 from pylan.projections.multiply import Multiply  # noqa: F401
 from pylan.projections.replace import Replace  # noqa: F401
 from pylan.projections.subtract import Subtract  # noqa: F401
+from pylan.projections.transfer import Transfer  # noqa: F401
+from pylan.reducers import (  # noqa: F401
+    Crossing,
+    Drawdown,
+    Inflow,
+    Max,
+    Min,
+    Outflow,
+    Reducer,
+)
 from pylan.result import Result  # noqa: F401
+from pylan.simulation import Simulation  # noqa: F401
+from pylan.sinks import CallbackSink, CsvSink, MappedSink, NpySink, Sink  # noqa: F401
+from pylan.sweep import Sweep  # noqa: F401
+from pylan.timeline import Timeline  # noqa: F401
@@ -0,0 +1,168 @@
+from array import array
+from datetime import datetime
+from typing import Any, Iterator
+
+from pylan.context import RunContext
+from pylan.grid import Grid
+from pylan.incremental import Checkpoint
+from pylan.result import Result
+from pylan.schedule import keep_or_convert
+
+
+class Branch:
+    """@public
+    Outputted by Item.branch(). A scenario that can be forked at a date into branches with
+    projections added or removed. Branches share the values before the fork with their
+    parent and only compute and store the values from the fork on. Values are computed
+    when they are needed: a fork runs its parent up to the fork date, a result runs the
+    branch up to the end date. Uses the loop engine.
+
+    >>> root = savings.branch("2024-1-1", "2054-1-1")
+    >>> sell = root.fork("2030-1-1", add=[Add(["2030-1-1"], 250000)], remove=[rent])
+    >>> invest = sell.fork("2031-1-1", add=[Multiply("1y", 1.05)])
+    >>> pay_off = sell.fork("2031-1-1", remove=[mortgage])
+    >>> for leaf in root.leaves():
+    >>>     print(leaf.result.final)
+    """
+
+    def __init__(
+        self,
+        grid: Grid,
+        start_value: float,
+        projections: list[Any],
+        parent: Any = None,
+        first: int = 0,
+        checkpoint: Checkpoint = None,
+    ) -> None:
+        self.grid = grid
+        self.start_value = start_value
+        self.projections = projections
+        self.parent = parent
+        self.first = first
+        self.children = []
+        self.values = array("d")
+        self.date = grid[first] if first < len(grid) else None
+        self.every = max(1, len(grid) // 100)
+        self.checkpoints = [checkpoint or Checkpoint(first - 1)]
+        self.context = self.__restore(self.checkpoints[0])
+
+    def __restore(self, checkpoint: Checkpoint) -> RunContext:
+        """@private
+        Creates a context for the projections of the branch at a checkpoint, on a grid
+        that starts right after it. Projections that are not in the checkpoint were added
+        at the fork, their dates up to the fork are skipped.
+        """
+        context = RunContext(self, self.grid.start, self.grid.end)
+        if checkpoint.tick >= 0:
+            context.value = checkpoint.value
+            date = self.grid[checkpoint.tick]
+            for state in context.states:
+                if id(state.projection) in checkpoint.states:
+                    state.restore(*checkpoint.states[id(state.projection)], date)
+                else:
+                    state.skip(date)
+        if checkpoint.tick + 1 < len(self.grid):
+            start = self.grid[checkpoint.tick + 1]
+            context.resolve(Grid(start, self.grid.end, self.grid.granularity))
+        return context
+
+    def __run(
+        self, context: RunContext, origin: int, begin: int, end: int, values: Any
+    ) -> None:
+        """@private
+        Runs a context of the branch from tick begin up to (not including) tick end, where
+        origin is the tick that the grid of the context starts at.
+        """
+        states = context.states
+        for tick in range(begin, min(end, len(self.grid))):
+            for state in states:
+                if state.scheduled(tick - origin):
+                    state.apply(context)
+            values.append(context.value)
+
+    def __run_to(self, tick: int) -> None:
+        """@private
+        Runs the branch up to (not including) the tick, and keeps a checkpoint every
+        hundredth of the grid to fork from later.
+        """
+        current = self.first + len(self.values)
+        while current < min(tick, len(self.grid)):
+            end = min(tick, (current // self.every + 1) * self.every)
+            self.__run(self.context, self.first, current, end, self.values)
+            current = self.first + len(self.values)
+            if current % self.every == 0:
+                self.checkpoints.append(Checkpoint(current - 1, self.context))
+
+    def __checkpoint(self, tick: int) -> Checkpoint:
+        """@private
+        Returns the state of the branch after the tick. If the branch already ran past
+        the tick, it runs again from the last checkpoint before it.
+        """
+        self.__run_to(tick + 1)
+        if tick == self.first + len(self.values) - 1:
+            return Checkpoint(tick, self.context)
+        checkpoint = max(
+            (c for c in self.checkpoints if c.tick <= tick), key=lambda c: c.tick
+        )
+        context = self.__restore(checkpoint)
+        begin = checkpoint.tick + 1
+        self.__run(context, begin, begin, tick + 1, array("d"))
+        return Checkpoint(tick, context)
+
+    def fork(
+        self, date: str | datetime, add: list[Any] = None, remove: list[Any] = None
+    ) -> Any:
+        """@public
+        Creates a branch that follows this branch up to the date, and continues with the
+        projections added and removed from there on. Added projections only apply on and
+        after the date. The new branch is returned.
+
+        >>> sell = root.fork("2030-1-1", add=[sale], remove=[rent])
+        """
+        add, remove = add or [], remove or []
+        for projection in remove:
+            if all(projection is not own for own in self.projections):
+                raise Exception("Projection " + str(projection) + " is not in branch.")
+        first = self.grid.ceil(keep_or_convert(date))
+        if first < self.first:
+            raise Exception("Can't fork before the start of the branch.")
+        checkpoint = self.__checkpoint(first - 1)
+        projections = [
+            projection
+            for projection in self.projections
+            if all(projection is not removed for removed in remove)
+        ]
+        branch = Branch(
+            self.grid, self.start_value, projections + add, self, first, checkpoint
+        )
+        self.children.append(branch)
+        return branch
+
+    def leaves(self) -> Iterator[Any]:
+        """@public
+        Yields the branches without forks, the leaves of the scenario tree.
+
+        >>> results = [leaf.result for leaf in root.leaves()]
+        """
+        if not self.children:
+            yield self
+        for child in self.children:
+            yield from child.leaves()
+
+    @property
+    def result(self) -> Result:
+        """@public
+        Runs the branch up to the end date and returns the result, with the values of
+        the parent branches before the fork.
+
+        >>> sell.result.final
+        """
+        self.__run_to(len(self.grid))
+        chain = [self]
+        while chain[-1].parent is not None:
+            chain.append(chain[-1].parent)
+        values = array("d")
+        for branch, end in zip(reversed(chain), [b.first for b in reversed(chain)][1:]):
+            values.extend(branch.values[: end - branch.first])
+        values.extend(self.values)
+        return Result.from_arrays(self.grid.epochs(), values)
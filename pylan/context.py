@@ -0,0 +1,214 @@
+from datetime import datetime
+from heapq import merge
+from itertools import groupby, islice
+from operator import itemgetter
+from types import SimpleNamespace
+from typing import Any, Iterator
+
+from pylan.grid import Grid
+from pylan.schedule import iter_schedule
+
+
+def apply_operation(operation: str, value: Any, operand: Any) -> Any:
+    """@private
+    Applies a projection operation to a value, where both can be a number or an array
+    with a value per path.
+    """
+    if operation == "add":
+        return value + operand
+    elif operation == "subtract":
+        return value - operand
+    elif operation == "multiply":
+        return value * operand
+    elif operation == "divide":
+        return value / operand
+    elif operation == "replace":
+        return operand
+    raise Exception("Operation " + str(operation) + " is not supported.")
+
+
+def nested_ticks(index: int, state: Any, grid: Grid) -> Iterator[tuple[int, int, Any]]:
+    """@private
+    Yields (tick, index, state) for every date of a nested projection, where the tick is
+    the first tick after the date (when the parent value is updated). All dates before a
+    tick are applied on that tick, so ticks never go back.
+    """
+    previous = 0
+    for date in state.upcoming():
+        previous = max(grid.above(date), previous)
+        yield previous, index, state
+
+
+def nested_changes(state: Any, grid: Grid) -> Iterator[tuple[int, Any]]:
+    """@private
+    Yields (tick, nested projection state) for every time a nested projection changes
+    the value of a projection, up to the end of the grid. The nested projections are
+    merged lazily by tick, and by the order in which they were added within a tick.
+    """
+    streams = [
+        nested_ticks(index, nested, grid)
+        for index, nested in enumerate(state.projections)
+    ]
+    for tick, _, nested in merge(*streams, key=itemgetter(0, 1)):
+        if tick >= len(grid):
+            return
+        yield tick, nested
+
+
+def value_timeline(state: Any, grid: Grid) -> Iterator[tuple[int, float]]:
+    """@private
+    Yields (tick, value) for every tick on which the nested projections change the value
+    of a projection. Works for unbounded grids as well.
+    """
+    target = SimpleNamespace(value=state.value)
+    for tick, changes in groupby(nested_changes(state, grid), itemgetter(0)):
+        for _, nested in changes:
+            nested.apply(target)
+        yield tick, target.value
+
+
+class RunContext:
+    """@public
+    Holds the state of a single run of an item: the current value and the state of every
+    projection (value, iterations and upcoming dates). Items and projections only hold
+    the definition, so they can be shared between runs and threads. Item.iterate() yields
+    the context of the run.
+
+    >>> for date, context in savings.iterate("2024-1-1", "2025-1-1", Granularity.day):
+    >>>     print(date, context.value)
+    """
+
+    def __init__(
+        self, item: Any, start: datetime, end: datetime = None, profiler: Any = None
+    ) -> None:
+        self.item = item
+        self.value = item.start_value
+        state = ProjectionState if profiler is None else profiler.state
+        self.states = [state(projection, start, end) for projection in item.projections]
+
+    def resolve(self, grid: Grid) -> None:
+        """@private
+        Resolves the values of projections with nested projections on the grid of the
+        run.
+        """
+        [state.resolve(grid) for state in self.states]
+
+
+class ProjectionState:
+    def __init__(self, projection: Any, start: datetime, end: datetime = None) -> None:
+        """@private
+        State of a projection during a run. The value starts at the value of the
+        projection and can be changed by the nested projections, see resolve(). The
+        schedule is streamed, only the next scheduled date is kept in memory. Without an
+        end date, the stream is unbounded.
+        """
+        self.projection = projection
+        self.operation = projection.operation
+        self.value = projection.value
+        self.iterations = 0
+        start, end = projection.bounds(start, end)
+        schedule, include_start = projection.schedule, projection.include_start
+        self.dates = iter_schedule(schedule, start, end, include_start)
+        self.next_date = next(self.dates, None)
+        self.projections = [
+            self.nested_state(nested, start, end) for nested in projection.projections
+        ]
+        self.grid = None
+        self.next_tick = None
+        self.timeline = iter(())
+        self.next_change = None
+
+    def nested_state(self, projection: Any, start: datetime, end: datetime) -> Any:
+        """@private
+        Creates the state of a nested projection.
+        """
+        return ProjectionState(projection, start, end)
+
+    def apply(self, target: Any) -> None:
+        """@private
+        Applies the projection with the value of this run to the target (a run context or
+        the state of another projection). Projections without an operation fall back to
+        their own apply method.
+        """
+        if self.operation is None:
+            self.projection.apply(target)
+        else:
+            target.value = apply_operation(self.operation, target.value, self.value)
+
+    def resolve(self, grid: Grid) -> None:
+        """@private
+        Puts the projection on the ticks of the grid. The next scheduled date becomes
+        the tick on which it fires, and the nested projections are resolved into a
+        timeline of the value which is looked up with a cursor while the run advances.
+        """
+        self.grid = grid
+        self.next_tick = None if self.next_date is None else grid.ceil(self.next_date)
+        if self.projections:
+            self.timeline = value_timeline(self, grid)
+            self.next_change = next(self.timeline, None)
+
+    def update_value(self, tick: int) -> None:
+        """@private
+        Moves the value forward on the timeline, up to and including the tick.
+        """
+        while self.next_change is not None and self.next_change[0] <= tick:
+            self.value = self.next_change[1]
+            self.next_change = next(self.timeline, None)
+
+    def scheduled(self, tick: int) -> bool:
+        """@private
+        Returns true if the projection is scheduled on the tick of the grid. Fires at
+        most once per tick, dates that fall behind are caught up on the next ticks.
+        """
+        if self.projections:
+            self.update_value(tick)
+        if self.next_tick is None or tick < self.next_tick:
+            return False
+        self.advance()
+        if self.next_date is not None:
+            self.next_tick = self.grid.ceil(self.next_date)
+        else:
+            self.next_tick = None
+        return True
+
+    def restore(self, iterations: int, value: Any, date: datetime) -> None:
+        """@private
+        Moves a fresh state forward to a checkpoint of an earlier run: the number of
+        times the projection fired and its value at that moment. Dates of nested
+        projections before the date of the checkpoint are skipped, as they are already
+        part of the value.
+        """
+        if iterations:
+            self.next_date = next(islice(self.dates, iterations - 1, None), None)
+            self.iterations = iterations
+        self.value = value
+        for nested in self.projections:
+            while nested.next_date is not None and nested.next_date < date:
+                nested.advance()
+
+    def skip(self, date: datetime) -> None:
+        """@private
+        Skips the dates up to and including the date, for a projection that is added to
+        a run that is already at that date.
+        """
+        while self.next_date is not None and self.next_date <= date:
+            self.advance()
+        for nested in self.projections:
+            while nested.next_date is not None and nested.next_date < date:
+                nested.advance()
+
+    def advance(self) -> None:
+        """@private
+        Moves on to the next scheduled date of the projection.
+        """
+        self.iterations += 1
+        self.next_date = next(self.dates, None)
+
+    def upcoming(self) -> Iterator[datetime]:
+        """@private
+        Yields the remaining scheduled dates of the projection, moving on while doing so.
+        """
+        while self.next_date is not None:
+            date = self.next_date
+            self.advance()
+            yield date
@@ -0,0 +1,122 @@
+from calendar import monthrange
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterator
+
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+WEEKDAYS = ["SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"]
+FIELDS = [
+    ("minute", 0, 59, []),
+    ("hour", 0, 23, []),
+    ("day", 1, 31, []),
+    ("month", 1, 12, MONTHS),
+    ("weekday", 0, 6, WEEKDAYS),
+]
+
+
+def parse_field(field: str, name: str, low: int, high: int, names: list[str]) -> int:
+    """@private
+    Parses one field of a cron expression into a bitset, where bit n is set if value n
+    matches. Supports *, ranges (1-5), steps (*/2, 1-10/3), lists (1,2) and names (jan,
+    mon). Sunday can be 0 or 7.
+    """
+    if names:
+        field = field.upper()
+        for index, alternative in enumerate(names):
+            field = field.replace(alternative, str(low + index))
+    bits = 0
+    for part in field.split(","):
+        range_step = part.split("/")
+        if len(range_step) > 2 or not range_step[0]:
+            raise ValueError("Invalid value " + part + " for " + name + ".")
+        if range_step[0] == "*":
+            values = list(range(low, high + 1))
+        else:
+            bounds = [int(bound) for bound in range_step[0].split("-")]
+            if len(bounds) > 2 or bounds[-1] < bounds[0]:
+                raise ValueError("Invalid range " + range_step[0] + " for " + name + ".")
+            values = list(range(bounds[0], bounds[-1] + 1))
+            if name == "weekday":
+                values = [0 if value == 7 else value for value in values]
+            if min(values[0], values[-1]) < low or max(values[0], values[-1]) > high:
+                raise ValueError("Value out of range for " + name + ".")
+        if len(range_step) == 2:
+            step = int(range_step[1])
+            if step < 1:
+                raise ValueError("Invalid step " + range_step[1] + " for " + name + ".")
+            values = [v for v in values if v % step == values[0] % step or v == values[0]]
+        for value in values:
+            bits |= 1 << value
+    return bits
+
+
+class CronSchedule:
+    def __init__(self, expression: str) -> None:
+        """@private
+        Compiled cron expression (minute, hour, day, month, weekday). Every field is parsed
+        once into a bitset, after which occurrences are expanded in bulk one day at a time.
+        A date matches when both the day of the month and the weekday match.
+        """
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError("Cron expression needs 5 fields.")
+        minutes, hours, self.days, self.months, self.weekdays = [
+            parse_field(field, *settings) for field, settings in zip(fields, FIELDS)
+        ]
+        self.times = [
+            timedelta(hours=hour, minutes=minute)
+            for hour in range(24)
+            if hours >> hour & 1
+            for minute in range(60)
+            if minutes >> minute & 1
+        ]
+        self.possible = any(
+            self.days >> day & 1 and self.months >> month & 1
+            for month in range(1, 13)
+            for day in range(1, 30 if month == 2 else monthrange(2001, month)[1] + 1)
+        )
+
+    def matches(self, date: datetime) -> bool:
+        """@private
+        Returns true if the cron runs on the day of the date.
+        """
+        return bool(
+            self.months >> date.month & 1
+            and self.days >> date.day & 1
+            and self.weekdays >> date.isoweekday() % 7 & 1
+        )
+
+    def occurrences(self, start: datetime, end: datetime = None) -> Iterator[datetime]:
+        """@private
+        Yields the occurrences after start and before end (unbounded if end is None), in
+        sorted order.
+        """
+        if not self.possible:
+            return
+        day = datetime(start.year, start.month, start.day)
+        while end is None or day < end:
+            if not self.months >> day.month & 1:
+                day = datetime(day.year + day.month // 12, day.month % 12 + 1, 1)
+                continue
+            if self.matches(day):
+                for time in self.times:
+                    date = day + time
+                    if end is not None and date >= end:
+                        return
+                    if date > start:
+                        yield date
+            day += timedelta(days=1)
+
+    def expand(self, start: datetime, end: datetime) -> list[datetime]:
+        """@private
+        Returns all occurrences after start and before end as a sorted list.
+        """
+        return list(self.occurrences(start, end))
+
+
+@lru_cache(maxsize=256)
+def compile_cron(expression: str) -> CronSchedule:
+    """@private
+    Returns the compiled cron schedule, expressions are only parsed once.
+    """
+    return CronSchedule(expression)
@@ -0,0 +1,122 @@
+from abc import ABC, abstractmethod
+from math import exp
+from typing import Any
+
+
+class Distribution(ABC):
+    """@public
+    Distribution is an abstract base class for stochastic projection values, with the
+    following implementations:
+    - Normal(mean, std)
+    - LogNormal(mu, sigma)
+    - Uniform(low, high)
+
+    All implementations have an optional seed parameter, so the draws of a projection are
+    the same in every simulation regardless of the other projections. Item.simulate()
+    draws a new value for every path each time the projection is applied, Item.run() and
+    the other deterministic methods use the mean of the distribution.
+
+    >>> returns = Multiply("1y", Normal(1.07, 0.15, seed=1))
+    >>> savings.add_projection(returns)
+    >>> simulation = savings.simulate(10000, "2024-1-1", "2054-1-1")
+    """
+
+    def __init__(self, seed: int = None) -> None:
+        self.seed = seed
+
+    @property
+    @abstractmethod
+    def mean(self) -> float:
+        """@public
+        Returns the expected value of the distribution. Implemented in the specific
+        classes.
+        """
+        pass
+
+    @abstractmethod
+    def sample(self, rng: Any, size: int) -> Any:
+        """@private
+        Draws size values with a numpy random generator. Implemented in the specific
+        classes.
+        """
+        pass
+
+
+class Normal(Distribution):
+    """@public
+    Normal distribution with a mean and standard deviation.
+
+    >>> inflation = Divide("1y", Normal(1.02, 0.01))
+    """
+
+    def __init__(self, mean: float, std: float, seed: int = None) -> None:
+        super().__init__(seed)
+        self.loc = mean
+        self.std = std
+
+    @property
+    def mean(self) -> float:
+        """@private
+        Returns the mean of the distribution.
+        """
+        return self.loc
+
+    def sample(self, rng: Any, size: int) -> Any:
+        """@private
+        Draws size values from the normal distribution.
+        """
+        return rng.normal(self.loc, self.std, size)
+
+
+class LogNormal(Distribution):
+    """@public
+    Log-normal distribution, where mu and sigma are the mean and standard deviation of
+    the underlying normal distribution. Useful for growth factors, since the values are
+    always positive.
+
+    >>> returns = Multiply("1y", LogNormal(0.06, 0.15))
+    """
+
+    def __init__(self, mu: float, sigma: float, seed: int = None) -> None:
+        super().__init__(seed)
+        self.mu = mu
+        self.sigma = sigma
+
+    @property
+    def mean(self) -> float:
+        """@private
+        Returns the mean of the distribution.
+        """
+        return exp(self.mu + self.sigma**2 / 2)
+
+    def sample(self, rng: Any, size: int) -> Any:
+        """@private
+        Draws size values from the log-normal distribution.
+        """
+        return rng.lognormal(self.mu, self.sigma, size)
+
+
+class Uniform(Distribution):
+    """@public
+    Uniform distribution between low and high.
+
+    >>> expenses = Subtract("1m", Uniform(1000, 1500))
+    """
+
+    def __init__(self, low: float, high: float, seed: int = None) -> None:
+        super().__init__(seed)
+        self.low = low
+        self.high = high
+
+    @property
+    def mean(self) -> float:
+        """@private
+        Returns the mean of the distribution.
+        """
+        return (self.low + self.high) / 2
+
+    def sample(self, rng: Any, size: int) -> Any:
+        """@private
+        Draws size values from the uniform distribution.
+        """
+        return rng.uniform(self.low, self.high, size)
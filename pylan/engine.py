@@ -0,0 +1,235 @@
+from array import array
+from datetime import datetime
+from enum import Enum
+from heapq import merge
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, Iterable, Iterator
+
+from pylan.context import nested_changes
+from pylan.grid import Grid
+from pylan.result import BATCH_SIZE, Result
+from pylan.schedule import to_epoch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class Engine(Enum):
+    """@public
+    Refers to the way Item.run() steps through time. The loop engine visits every tick
+    of the granularity and checks every projection. The event engine jumps from one
+    scheduled date to the next, and only fills in the ticks in between when dense output
+    is requested. The vector engine computes all values at once with numpy (optional
+    dependency). All engines produce the same values.
+
+    >>> from pylan import Engine
+    >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, engine=Engine.event)
+    >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, engine=Engine.vector)
+    """
+
+    loop = "loop"
+    event = "event"
+    vector = "vector"
+
+
+def fire_ticks(dt_schedule: Iterable[datetime], grid: Grid) -> list[int]:
+    """@private
+    Returns the ticks on which a projection is applied. Same as Projection.scheduled(), a
+    projection fires at most once per tick, so events that fall behind the grid are
+    caught up one tick at a time.
+    """
+    ticks = []
+    previous = -1
+    for date in dt_schedule:
+        tick = max(grid.ceil(date), previous + 1)
+        if tick >= len(grid):
+            break
+        ticks.append(tick)
+        previous = tick
+    return ticks
+
+
+def nested_events(state: Any, grid: Grid) -> list[tuple[int, Any]]:
+    """@private
+    Returns the (tick, nested projection state) pairs of a projection state, in the order
+    in which they are applied to the projection value (see nested_changes()).
+    """
+    return list(nested_changes(state, grid))
+
+
+def projection_events(states: list[Any], grid: Grid) -> Iterator[tuple[int, int]]:
+    """@private
+    Merges the schedules of all projection states into one stream of (tick, index) pairs,
+    using a heap based k-way merge. Projections that fire on the same tick keep their
+    order.
+    """
+    streams = [
+        [(tick, index) for tick in fire_ticks(state.upcoming(), grid)]
+        for index, state in enumerate(states)
+    ]
+    return merge(*streams)
+
+
+def scheduled_events(states: list[Any], grid: Grid) -> Iterator[tuple[int, Any]]:
+    """@private
+    Yields (tick, projection state) for every time a projection is applied, in the order
+    of Item.run(). The value of projections with nested projections is looked up on their
+    timeline right before they are yielded.
+    """
+    [state.resolve(grid) for state in states]
+    for tick, index in projection_events(states, grid):
+        state = states[index]
+        if state.projections:
+            state.update_value(tick)
+        yield tick, state
+
+
+def run_loop(context: Any, grid: Grid, result: Any = None) -> Any:
+    """@private
+    Loop version of Item.run(). Visits every tick of the grid and checks every projection,
+    with integer ticks instead of dates. Values are collected in an array and the dates
+    are only created for the result (or when rows are passed to a sink).
+    """
+    states = context.states
+    context.resolve(grid)
+    if result is None:
+        values = array("d")
+        for tick in range(len(grid)):
+            for state in states:
+                if state.scheduled(tick):
+                    state.apply(context)
+            values.append(context.value)
+        return Result.from_arrays(grid.epochs(), values)
+    events = getattr(result, "events", False)
+    for tick in range(len(grid)):
+        for state in states:
+            if state.scheduled(tick):
+                state.apply(context)
+                if events:
+                    result.add_event(state)
+        result.add_result(grid[tick], context.value)
+    return result
+
+
+def run_events(context: Any, grid: Grid, dense: bool = False, result: Any = None) -> Any:
+    """@private
+    Event driven version of Item.run(). Only visits the ticks where projections are
+    scheduled. With dense output the ticks in between are filled with the last value,
+    otherwise the result has the first tick, the ticks with events and the last tick.
+    The ticks in between are filled at once: in the arrays of the result, or in batches
+    of rows if a sink is passed as result.
+    """
+    events = getattr(result, "events", False)
+    ticks, values = array("q"), array("d")
+
+    def add_rows(begin: int, end: int, value: float) -> None:
+        if result is None:
+            if not dense:
+                ticks.extend(range(begin, end))
+            values.extend(array("d", [value]) * (end - begin))
+        elif end - begin == 1:
+            result.add_result(grid[begin], value)
+        else:
+            for batch in range(begin, end, BATCH_SIZE):
+                stop = min(end, batch + BATCH_SIZE)
+                dates = [grid[tick] for tick in range(batch, stop)]
+                result.add_results(dates, [value] * (stop - batch))
+
+    next_tick = 0
+    for tick, applied in groupby(scheduled_events(context.states, grid), itemgetter(0)):
+        if dense:
+            add_rows(next_tick, tick, context.value)
+        elif next_tick == 0 and tick > 0:
+            add_rows(0, 1, context.value)
+        for _, state in applied:
+            state.apply(context)
+            if events:
+                result.add_event(state)
+        add_rows(tick, tick + 1, context.value)
+        next_tick = tick + 1
+
+    if dense:
+        add_rows(next_tick, len(grid), context.value)
+    elif next_tick < len(grid):
+        if next_tick == 0 and len(grid) > 1:
+            add_rows(0, 1, context.value)
+        add_rows(len(grid) - 1, len(grid), context.value)
+    if result is not None:
+        return result
+    if dense:
+        return Result.from_arrays(grid.epochs(), values)
+    epochs = array("q", [to_epoch(grid[tick]) for tick in ticks])
+    return Result.from_arrays(epochs, values)
+
+
+def accumulate(operation: str, value: float, operands: list[float]) -> Any:
+    """@private
+    Applies a run of operations of the same kind to a value and returns every
+    intermediate value. The ufuncs accumulate from left to right, so the floating point
+    results are the same as applying them one by one.
+    """
+    if operation == "replace":
+        return np.array(operands, dtype=float)
+    if operation == "subtract":
+        operation, operands = "add", [-operand for operand in operands]
+    ufunc = getattr(np, operation)
+    return ufunc.accumulate(np.array([value] + operands, dtype=float))[1:]
+
+
+def run_vector(context: Any, grid: Grid, result: Any = None) -> Any:
+    """@private
+    Vectorized version of Item.run(), requires numpy. The events are turned into index
+    arrays on the grid, consecutive events of the same kind are computed with cumulative
+    sums/products (with replace as a reset point), and the values are spread over the
+    ticks at once. If a sink is passed as result, the rows are passed on in batches.
+    """
+    if np is None:
+        raise Exception("Engine.vector requires numpy (pip install numpy).")
+    events = getattr(result, "events", False)
+    ticks, operations, operands = [], [], []
+    for tick, state in scheduled_events(context.states, grid):
+        if state.operation is None:
+            name = type(state.projection).__name__
+            raise Exception(name + " has no vectorized operation.")
+        if events:
+            result.add_event(state)
+        ticks.append(tick)
+        operations.append(state.operation)
+        operands.append(state.value)
+
+    if not ticks:
+        values = np.full(len(grid), context.value, dtype=float)
+        return vector_result(grid_epochs(grid), values, result)
+    values = np.empty(len(ticks), dtype=float)
+    value, begin = context.value, 0
+    for operation, run in groupby(operations):
+        end = begin + len(list(run))
+        values[begin:end] = accumulate(operation, value, operands[begin:end])
+        value, begin = values[end - 1], end
+
+    last_event = np.searchsorted(ticks, np.arange(len(grid)), side="right") - 1
+    trajectory = np.where(last_event >= 0, values[last_event], context.value)
+    context.value = values[-1].item()
+    return vector_result(grid_epochs(grid), trajectory, result)
+
+
+def vector_result(epochs: Any, values: Any, result: Any) -> Any:
+    """@private
+    Creates a result from the arrays, or passes them on to a sink in batches.
+    """
+    if result is None:
+        return Result.from_arrays(epochs, values)
+    for begin in range(0, len(epochs), BATCH_SIZE):
+        dates = epochs[begin : begin + BATCH_SIZE].astype("datetime64[us]").tolist()
+        result.add_results(dates, values[begin : begin + BATCH_SIZE].tolist())
+    return result
+
+
+def grid_epochs(grid: Grid) -> Any:
+    """@private
+    Returns all dates of the grid as a numpy array with epoch microseconds.
+    """
+    return np.frombuffer(grid.epochs(), dtype=np.int64)
@@ -1,4 +1,4 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 from enum import Enum
 
 from dateutil.relativedelta import relativedelta
@@ -45,12 +45,29 @@ class Granularity(Enum):
 
     @property
     def timedelta(self) -> timedelta:
+        return TIMEDELTAS[self]
+
+    def floor(self, date: datetime) -> datetime:
+        """@private
+        Returns the start of the calendar period (hour, day, week, month or year) of the
+        date.
+        """
         if self == Granularity.hour:
-            return relativedelta(hours=1)
-        elif self == Granularity.day:
-            return relativedelta(days=1)
+            return date.replace(minute=0, second=0, microsecond=0)
+        day = date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if self == Granularity.day:
+            return day
         elif self == Granularity.week:
-            return relativedelta(weeks=1)
+            return day - timedelta(days=day.weekday())
         elif self == Granularity.month:
-            return relativedelta(months=1)
-        raise Exception("Granularity not found.")
+            return day.replace(day=1)
+        return day.replace(month=1, day=1)
+
+
+TIMEDELTAS = {
+    Granularity.hour: relativedelta(hours=1),
+    Granularity.day: relativedelta(days=1),
+    Granularity.week: relativedelta(weeks=1),
+    Granularity.month: relativedelta(months=1),
+    Granularity.year: relativedelta(years=1),
+}
@@ -0,0 +1,95 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from sys import maxsize
+
+from pylan.granularity import Granularity
+from pylan.schedule import MICROSECOND, to_epoch
+
+FIXED_STEPS = {
+    Granularity.hour: timedelta(hours=1),
+    Granularity.day: timedelta(days=1),
+    Granularity.week: timedelta(weeks=1),
+}
+
+
+class Grid:
+    def __init__(self, start: datetime, end: datetime, granularity: Granularity) -> None:
+        """@private
+        The ticks that a run visits between start and end. Fixed size steps (hours, days,
+        weeks) are computed on the fly, months are stepped through once since adding
+        months to a date doesn't have a fixed size. Without an end date the grid is
+        unbounded, and months are stepped through when they are needed.
+        """
+        self.start = start
+        self.end = end
+        self.granularity = granularity
+        self.step = FIXED_STEPS.get(granularity)
+        self.dates = None
+        if end is None:
+            self.length = maxsize
+            self.dates = None if self.step else [start]
+        elif self.step:
+            self.length = (end - start) // self.step + 1 if end >= start else 0
+        else:
+            self.dates = []
+            current = start
+            while current <= end:
+                self.dates.append(current)
+                current += granularity.timedelta
+            self.length = len(self.dates)
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, tick: int) -> datetime:
+        if self.dates is not None:
+            if self.end is None:
+                while len(self.dates) <= tick:
+                    self.__extend()
+            return self.dates[tick]
+        return self.start + tick * self.step
+
+    def __extend(self) -> None:
+        """@private
+        Adds the next month to an unbounded grid.
+        """
+        self.dates.append(self.dates[-1] + self.granularity.timedelta)
+
+    def epochs(self) -> array:
+        """@private
+        Returns all ticks as epoch microseconds. Fixed size steps are computed with
+        integers only.
+        """
+        if self.dates is None:
+            step = self.step // MICROSECOND
+            first = to_epoch(self.start)
+            return array("q", range(first, first + self.length * step, step))
+        return array("q", [to_epoch(date) for date in self.dates])
+
+    def __iter__(self):
+        return (self[tick] for tick in range(self.length))
+
+    def ceil(self, date: datetime) -> int:
+        """@private
+        Returns the first tick that is on or after the date.
+        """
+        if self.dates is not None:
+            while self.end is None and self.dates[-1] <= date:
+                self.__extend()
+            return bisect_left(self.dates, date)
+        if date <= self.start:
+            return 0
+        return -((self.start - date) // self.step)
+
+    def above(self, date: datetime) -> int:
+        """@private
+        Returns the first tick that is strictly after the date.
+        """
+        if self.dates is not None:
+            while self.end is None and self.dates[-1] <= date:
+                self.__extend()
+            return bisect_right(self.dates, date)
+        if date < self.start:
+            return 0
+        return (date - self.start) // self.step + 1
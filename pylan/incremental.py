@@ -0,0 +1,187 @@
+from array import array
+from datetime import datetime
+from typing import Any
+
+from pylan.context import RunContext
+from pylan.granularity import Granularity
+from pylan.grid import Grid
+from pylan.result import Result
+
+
+def fingerprint(projection: Any) -> tuple:
+    """@private
+    Returns the definition of a projection and its nested projections as a tuple, so
+    changes to a projection can be found after a run.
+    """
+    schedule = projection.schedule
+    return (
+        type(projection),
+        tuple(schedule) if isinstance(schedule, list) else schedule,
+        projection.value,
+        projection.start_date,
+        projection.end_date,
+        projection.offset,
+        projection.include_start,
+        tuple(fingerprint(nested) for nested in projection.projections),
+    )
+
+
+def first_date(state: Any) -> datetime | None:
+    """@private
+    Returns the first scheduled date of a fresh projection state and its nested states,
+    the first date on which the projection can change the run.
+    """
+    dates = [first_date(nested) for nested in state.projections] + [state.next_date]
+    dates = [date for date in dates if date is not None]
+    return min(dates) if dates else None
+
+
+class Checkpoint:
+    def __init__(self, tick: int, context: Any = None) -> None:
+        """@private
+        State of a run after a tick: the value of the item, and for every projection the
+        number of times it fired and its value. Tick -1 is the start of the run.
+        """
+        self.tick = tick
+        self.value = None if context is None else context.value
+        self.states = {}
+        if context is not None:
+            for state in context.states:
+                self.states[id(state.projection)] = (state.iterations, state.value)
+
+
+class IncrementalRun:
+    """@public
+    Outputted by Item.incremental(). Runs the item once and keeps checkpoints of the run
+    state at regular ticks. After projections are added, removed or changed, update()
+    runs again from the last checkpoint before the first date that the changes affect,
+    so the time it takes depends on how late the change starts instead of the horizon.
+    Uses the loop engine, the values are the same as Item.run().
+
+    >>> run = savings.incremental("2024-1-1", "2064-1-1", Granularity.day)
+    >>> run.result
+    >>> mortgage.value = 1200
+    >>> run.update() # runs again from the first mortgage payment
+    >>> savings.add_projection(Subtract("1m", 300, start_date="2040-1-1"))
+    >>> run.update() # runs again from 2040
+    >>> run.resumed_from
+    """
+
+    def __init__(
+        self,
+        item: Any,
+        start: datetime,
+        end: datetime,
+        granularity: Granularity,
+        checkpoints: int = 100,
+    ) -> None:
+        self.item = item
+        self.start = start
+        self.end = end
+        self.grid = Grid(start, end, granularity)
+        self.every = max(1, len(self.grid) // checkpoints)
+        self.epochs = self.grid.epochs()
+        self.values = array("d")
+        self.checkpoints = []
+        self.resumed_from = None
+        self.__definitions = {}
+        self.__start_value = None
+        self.update()
+
+    @property
+    def result(self) -> Result:
+        """@public
+        Returns the result of the latest run.
+
+        >>> run.result.final
+        """
+        return Result.from_arrays(self.epochs, self.values)
+
+    def update(self) -> Result:
+        """@public
+        Compares the projections of the item with the previous run, and runs again from
+        the last checkpoint before the first affected date. Changing the start value or
+        the order of the projections runs again from the start. Returns the result.
+
+        >>> mortgage.value = 1200
+        >>> run.update()
+        """
+        context = RunContext(self.item, self.start, self.end)
+        definitions = {
+            id(state.projection): (fingerprint(state.projection), first_date(state))
+            for state in context.states
+        }
+        date = self.__affected_date(context, definitions)
+        changed = {
+            key
+            for key in set(self.__definitions) | set(definitions)
+            if self.__definitions.get(key, (None,))[0] != definitions.get(key, (None,))[0]
+        }
+        self.__definitions = definitions
+        self.__start_value = context.value
+        if date is None:
+            self.resumed_from = None
+            return self.result
+
+        checkpoint = Checkpoint(-1)
+        while self.checkpoints and self.grid[self.checkpoints[-1].tick] >= date:
+            self.checkpoints.pop()
+        for kept in self.checkpoints:
+            for key in changed & set(kept.states):
+                del kept.states[key]
+        if self.checkpoints:
+            checkpoint = self.checkpoints[-1]
+        del self.values[checkpoint.tick + 1 :]
+        self.__resume(context, checkpoint)
+        return self.result
+
+    def __affected_date(self, context: Any, definitions: dict) -> datetime | None:
+        """@private
+        Returns the first date on which the run can differ from the previous run, or None
+        if nothing changed.
+        """
+        previous = self.__definitions
+        ids = [id(state.projection) for state in context.states]
+        common = [key for key in ids if key in previous]
+        if (
+            self.__start_value is None
+            or context.value != self.__start_value
+            or len(set(ids)) != len(ids)
+            or common != [key for key in previous if key in definitions]
+        ):
+            return self.start
+        dates = []
+        for key in set(previous) | set(definitions):
+            if previous.get(key, (None,))[0] != definitions.get(key, (None,))[0]:
+                dates.append(previous.get(key, (None, None))[1])
+                dates.append(definitions.get(key, (None, None))[1])
+        dates = [date for date in dates if date is not None]
+        return min(dates) if dates else None
+
+    def __resume(self, context: Any, checkpoint: Checkpoint) -> None:
+        """@private
+        Restores the context to the checkpoint and runs the remaining ticks, on a grid
+        that starts right after the checkpoint. Projections that are new or changed have
+        not fired before the checkpoint, so they are left out of it and start fresh.
+        """
+        first = checkpoint.tick + 1
+        self.resumed_from = self.grid[first] if first < len(self.grid) else None
+        if self.resumed_from is None:
+            return
+        if checkpoint.tick >= 0:
+            context.value = checkpoint.value
+            for state in context.states:
+                if id(state.projection) in checkpoint.states:
+                    iterations, value = checkpoint.states[id(state.projection)]
+                    state.restore(iterations, value, self.grid[checkpoint.tick])
+        grid = Grid(self.resumed_from, self.end, self.grid.granularity)
+        context.resolve(grid)
+
+        states, values, every = context.states, self.values, self.every
+        for tick in range(first, first + len(grid)):
+            for state in states:
+                if state.scheduled(tick - first):
+                    state.apply(context)
+            values.append(context.value)
+            if (tick + 1) % every == 0:
+                self.checkpoints.append(Checkpoint(tick, context))
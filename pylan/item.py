@@ -1,15 +1,34 @@
 from datetime import datetime, timedelta
 from typing import Any
 
+from pylan.branch import Branch
+from pylan.context import RunContext
+from pylan.engine import Engine, run_events, run_loop, run_vector
 from pylan.granularity import Granularity
+from pylan.grid import Grid
+from pylan.incremental import IncrementalRun
+from pylan.output import Output, Recorder, output_policy
+from pylan.plan import Plan, compile_program
+from pylan.profiler import Profiler, phase
 from pylan.projections import Projection
+from pylan.reducers import Reducer, Reduction
 from pylan.result import Result
 from pylan.schedule import keep_or_convert
+from pylan.simulation import Simulation, run_paths
+from pylan.sinks import MappedSink, Sink
+from pylan.sweep import Sweep, run_sweep
+from pylan.timeline import Timeline
 
 
 class ItemIterator:
     def __init__(
-        self, item: Any, start: datetime, end: datetime, granularity: Granularity
+        self,
+        item: Any,
+        start: datetime,
+        end: datetime,
+        granularity: Granularity,
+        profiler: Profiler = None,
+        output: Output | Granularity = None,
     ) -> None:
         """@private
         Iterator class for the item object. See the docstring of Item.iterate() for more
@@ -17,10 +36,14 @@ class ItemIterator:
         """
         self.item = item
         self.start = start
-        self.current = start
         self.end = end
         self.granularity = granularity
-        [projection.setup(start, end) for projection in item.projections]
+        self.tick = 0
+        with phase(profiler, "setup"):
+            self.grid = Grid(start, None, granularity)
+            self.context = RunContext(item, start, end, profiler)
+        self.context.resolve(self.grid)
+        self.keep = None if output is None else output_policy(output).selector(self.grid)
 
     def __iter__(self) -> Any:
         """@private
@@ -30,32 +53,47 @@ class ItemIterator:
 
     def __next__(self) -> Any:
         """@private
-        Every iteration, the current time is increased and projections are applied.
+        Every iteration, the projections are applied and the current tick is increased.
+        With an output policy, ticks are applied until the policy records one.
         """
-        if self.current > self.end:
-            raise StopIteration
-        for projection in self.item.projections:
-            if projection.scheduled(self.current):
-                projection.apply(self.item)
-        self.current += self.granularity.timedelta
-        return self.current, self.item
+        while True:
+            if self.end is not None and self.grid[self.tick] > self.end:
+                raise StopIteration
+            for state in self.context.states:
+                if state.scheduled(self.tick):
+                    state.apply(self.context)
+            self.tick += 1
+            if self.keep is None or self.keep(self.tick - 1, self.context.value):
+                return self.grid[self.tick], self.context
 
 
 class Item:
     """@public
     An item that you can apply projections to and simulate over time. Optionally, you can
-    set a start value.
+    set a start value. Runs don't change the item, so the same item can be run from
+    multiple threads at once.
 
     >>> savings = Item(start_value=100)
     """
 
     def __init__(self, start_value: int = 0) -> None:
         self.projections = []
-        self.iterations = 0
-        self.value = start_value if start_value else 0
         self.start_value = start_value if start_value else 0
         self.granularity = None
 
+    def __setup(
+        self, start: datetime | str, end: datetime | str, granularity: Granularity
+    ) -> tuple[datetime, datetime, Granularity]:
+        """@private
+        Checks the projections and converts the settings for a run between start and end
+        date.
+        """
+        if not granularity:
+            granularity = self.granularity
+        if not self.projections:
+            raise Exception("No projections have been added.")
+        return keep_or_convert(start), keep_or_convert(end), granularity
+
     def add_projection(self, projection: Projection) -> None:
         """@public
         Add a projection object to this item.
@@ -87,78 +125,251 @@ class Item:
             raise Exception("parameter is not list, use add_projection instead.")
 
     def run(
-        self, start: datetime | str, end: datetime | str, granularity: Granularity = None
-    ) -> list:
+        self,
+        start: datetime | str,
+        end: datetime | str,
+        granularity: Granularity = None,
+        engine: Engine = Engine.loop,
+        dense: bool = False,
+        sink: Sink = None,
+        profiler: Profiler = None,
+        output: Output | Granularity = None,
+        reducers: dict[str, Reducer] = None,
+        mapped: str = None,
+    ) -> Result | Sink | dict[str, Any]:
         """@public
         Runs the provided projections between the start and end date. Creates a result
-        object with all the iterations per day/month/etc.
+        object with all the iterations per day/month/etc. With the event engine, only the
+        dates where projections are scheduled end up in the result, unless dense is set.
+        If a sink is passed, the rows are written to the sink in batches instead, and the
+        closed sink is returned. Pass a profiler to collect counters and timings. An
+        output policy (or a coarser granularity) records fewer rows, from every tick of
+        the simulation (see Output). With a dict of reducers, no rows are stored and only
+        the aggregates are returned by name (see Reducer). If a filename is passed as
+        mapped, the rows are written to that file and the result is memory-mapped from it,
+        for runs that don't fit in memory (see MappedSink).
 
         >>> savings = Item(start_value=100)
         >>> savings.add_projections([gains, adds])
         >>> savings.run("2024-1-1", "2025-1-1")
+        >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, engine=Engine.event)
+        >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, sink=CsvSink("run.csv"))
+        >>> savings.run("2024-1-1", "2054-1-1", profiler=profiler)
+        >>> savings.run("2024-1-1", "2054-1-1", Granularity.day, output=Granularity.month)
+        >>> savings.run("2024-1-1", "2054-1-1", reducers={"lowest": Min()})
+        >>> savings.run("2024-1-1", "2124-1-1", Granularity.hour, mapped="run.res")
         """
-        if not granularity:
-            granularity = self.granularity
-        if not self.projections:
-            raise Exception("No projections have been added.")
-        start = keep_or_convert(start)
-        end = keep_or_convert(end)
-        [projection.setup(start, end) for projection in self.projections]
-        self.value = self.start_value
-        result = Result()
-
-        current = start
-        while current <= end:
-            for projection in self.projections:
-                if projection.scheduled(current):
-                    projection.apply(self)
-            result.add_result(current, self.value)
-            current += granularity.timedelta
+        with phase(profiler, "setup"):
+            start, end, granularity = self.__setup(start, end, granularity)
+            context = RunContext(self, start, end, profiler)
+            grid = Grid(start, end, granularity)
+            if mapped is not None:
+                if sink is not None:
+                    raise Exception("Can't pass a sink for a mapped result.")
+                sink = MappedSink(mapped)
+            policy = None if output is None else output_policy(output)
+            target = sink
+            if reducers is not None:
+                if sink is not None or policy is not None:
+                    raise Exception("Reducers can't be combined with a sink or output.")
+                target = Reduction(reducers)
+            if policy is not None:
+                rows = Result() if sink is None else sink
+                target = Recorder(policy, grid, rows, engine != Engine.event or dense)
+        with phase(profiler, "run"):
+            if engine == Engine.event:
+                result = run_events(context, grid, dense, target)
+            elif engine == Engine.vector:
+                result = run_vector(context, grid, target)
+            else:
+                result = run_loop(context, grid, target)
+        if policy is not None:
+            result = result.target
+        if sink is not None:
+            with phase(profiler, "output"):
+                sink.close()
+        if reducers is not None:
+            return result.values()
+        if mapped is not None:
+            return sink.result
         return result
 
+    def compile(
+        self, start: datetime | str, end: datetime | str, granularity: Granularity = None
+    ) -> Plan:
+        """@public
+        Parses, validates and expands the projections between the start and end date once
+        into a plan. The plan can be run many times (also with other values), pickled and
+        sent to other processes, without touching the item again.
+
+        >>> plan = savings.compile("2024-1-1", "2054-1-1", Granularity.day)
+        >>> plan.run(start_value=5000)
+        """
+        start, end, granularity = self.__setup(start, end, granularity)
+        grid = Grid(start, end, granularity)
+        context = RunContext(self, start, end)
+        return Plan(grid.epochs(), *compile_program(context, grid))
+
+    def incremental(
+        self,
+        start: datetime | str,
+        end: datetime | str,
+        granularity: Granularity = None,
+        checkpoints: int = 100,
+    ) -> IncrementalRun:
+        """@public
+        Runs the provided projections between the start and end date, and keeps a number
+        of checkpoints of the run. After editing the projections, IncrementalRun.update()
+        only runs again from the last checkpoint before the first changed date.
+
+        >>> run = savings.incremental("2024-1-1", "2064-1-1", Granularity.day)
+        >>> mortgage.value = 1200
+        >>> run.update()
+        """
+        start, end, granularity = self.__setup(start, end, granularity)
+        return IncrementalRun(self, start, end, granularity, checkpoints)
+
+    def branch(
+        self, start: datetime | str, end: datetime | str, granularity: Granularity = None
+    ) -> Branch:
+        """@public
+        Creates the root of a scenario tree between the start and end date. Branches are
+        forked from it at a date with projections added or removed, and share the values
+        before that date. Changes to the item afterwards don't affect the branches.
+
+        >>> root = savings.branch("2024-1-1", "2054-1-1")
+        >>> sell = root.fork("2030-1-1", add=[sale], remove=[rent])
+        >>> sell.result
+        """
+        start, end, granularity = self.__setup(start, end, granularity)
+        grid = Grid(start, end, granularity)
+        return Branch(grid, self.start_value, list(self.projections))
+
+    def simulate(
+        self,
+        n_paths: int,
+        start: datetime | str,
+        end: datetime | str,
+        granularity: Granularity = None,
+        seed: int = None,
+    ) -> Simulation:
+        """@public
+        Simulates n_paths paths between the start and end date at once, as a 2-D array
+        over the shared schedule. Projections with a distribution as value draw a new
+        value for every path each time they are applied. Requires numpy.
+
+        >>> savings = Item(start_value=100)
+        >>> savings.add_projections([Add("1m", 2500), Multiply("1y", Normal(1.07, 0.15))])
+        >>> simulation = savings.simulate(10000, "2024-1-1", "2054-1-1", seed=42)
+        >>> simulation.bands() # percentile bands as results
+        """
+        start, end, granularity = self.__setup(start, end, granularity)
+        context = RunContext(self, start, end)
+        return run_paths(context, Grid(start, end, granularity), n_paths, seed)
+
+    def sweep(
+        self,
+        parameters: dict[str, tuple[Projection, list[float]]],
+        start: datetime | str,
+        end: datetime | str,
+        granularity: Granularity = None,
+        workers: int = None,
+        executor: str = None,
+    ) -> Sweep:
+        """@public
+        Runs every combination of projection values between the start and end date. The
+        parameters map a name to a projection (can be nested) and the values to try. The
+        schedules are expanded once and shared, the combinations are spread over a process
+        pool with a worker per core (or threads on free threaded Python). The executor can
+        be set to "process" or "thread".
+
+        >>> growth = Multiply("1y", 1.05)
+        >>> salary.add_projection(growth)
+        >>> savings.add_projections([salary, rent])
+        >>> sweep = savings.sweep(
+        >>>     {"growth": (growth, [1.02, 1.04, 1.06]), "rent": (rent, [1200, 1600])},
+        >>>     "2024-1-1",
+        >>>     "2054-1-1",
+        >>> )
+        >>> sweep[1.04, 1600].final
+        """
+        plan = self.compile(start, end, granularity)
+        return run_sweep(plan, parameters, workers, executor)
+
+    def timeline(
+        self, start: datetime | str, end: datetime | str, granularity: Granularity = None
+    ) -> Timeline:
+        """@public
+        Compiles the projections between the start and end date into a timeline. The
+        timeline can be queried for the value on any date without running again.
+
+        >>> timeline = savings.timeline("2024-1-1", "2054-1-1")
+        >>> timeline.value_at("2040-5-5")
+        """
+        start, end, granularity = self.__setup(start, end, granularity)
+        return Timeline(RunContext(self, start, end), Grid(start, end, granularity))
+
     def until(
         self,
         stop_value: float,
-        start: datetime = datetime.today(),
-        max_iterations: int = 1000,
+        start: datetime | str = None,
+        max_iterations: int = 100000,
+        profiler: Profiler = None,
     ) -> timedelta:
         """@public
         Runs the provided projections until a stop value is reached. Returns the timedelta
-        needed to reach the stop value. NOTE: Don't use offset with a start date here.
+        needed to reach the stop value. The start date defaults to today. Projections fire
+        on the same ticks as in run(), also with cron schedules (which used to fire one
+        tick late here). Pass a profiler to collect counters and timings. NOTE: Don't use
+        offset with a start date here.
 
         >>> savings = Item(start_value=100)
         >>> savings.add_projections([gains, adds])
         >>> savings.until(200)  # returns timedelta
         """
-        current = start + self.granularity.timedelta
-        self.value = self.start_value
-        delta = timedelta()
-        iterations = 0
         if not self.projections:
             raise Exception("No projections have been added.")
+        with phase(profiler, "setup"):
+            start = keep_or_convert(start) if start else datetime.today()
+            context = RunContext(self, start, None, profiler)
+        iterations = 0
 
-        while self.value <= stop_value:
-            [projection.setup(start, current, iterative=True) for projection in self.projections]
-            for projection in self.projections:
-                if projection.scheduled(current):
-                    projection.apply(self)
-            current += self.granularity.timedelta
-            delta += self.granularity.timedelta
-            iterations += 1
-            if iterations > max_iterations:
-                raise Exception("Max iterations (" + str(max_iterations) + ") reached.")
-        return delta
+        with phase(profiler, "run"):
+            context.resolve(Grid(start, None, self.granularity))
+            while context.value <= stop_value:
+                for state in context.states:
+                    if state.scheduled(iterations + 1):
+                        state.apply(context)
+                iterations += 1
+                if iterations > max_iterations:
+                    message = "Max iterations (" + str(max_iterations) + ") reached."
+                    raise Exception(message)
+        return self.granularity.timedelta * iterations if iterations else timedelta()
 
     def iterate(
-        self, start: datetime | str, end: datetime | str, granularity: Granularity
+        self,
+        start: datetime | str,
+        end: datetime | str | None,
+        granularity: Granularity,
+        profiler: Profiler = None,
+        output: Output | Granularity = None,
     ) -> ItemIterator:
         """@public
         Creates Iterator object for the item. Can be used in a for loop. Returns a tuple
-        of datetime and item object.
+        of datetime and the run context, which holds the current value (breaking: this
+        used to be the item, apply projections by hand to the context). Schedules are
+        expanded while iterating, so with None as end date the iterator never stops. A
+        profiler only collects the projection counters and the setup time, as the time
+        between iterations is spent in the loop body. With an output policy (or a coarser
+        granularity), only the recorded ticks are yielded.
 
         >>> for date, saved in savings.iterate("2024-1-1", "2025-2-2", Granularity.day):
         >>>     print(date, saved.value)
+        >>> for date, saved in savings.iterate("2024-1-1", None, Granularity.day):
+        >>>     if saved.value > 10000:
+        >>>         break
+        >>> savings.iterate("2024-1-1", "2054-1-1", Granularity.day, output=OnChange())
         """
         start = keep_or_convert(start)
-        end = keep_or_convert(end)
-        return ItemIterator(self, start, end, granularity)
+        end = keep_or_convert(end) if end else None
+        return ItemIterator(self, start, end, granularity, profiler, output)
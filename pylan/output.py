@@ -0,0 +1,209 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from sys import maxsize
+from typing import Any, Callable
+
+from pylan.granularity import Granularity
+from pylan.grid import Grid
+
+
+class Output(ABC):
+    """@public
+    Output is an abstract base class for the output policies of Item.run() and
+    Item.iterate(), which decide which ticks of the run are recorded. The run itself still
+    visits every tick, so the values are exact. Implementations:
+    - Every(n): every n-th tick
+    - OnChange(): only the ticks where the value changed
+    - PeriodEnd(granularity): the last tick of every hour/day/week/month/year
+    - Sample(granularity): the ticks of a coarser granularity (also by passing the
+      granularity itself as output)
+
+    Runs always keep the first and the last tick.
+
+    >>> savings.run("2024-1-1", "2054-1-1", Granularity.day, output=Granularity.month)
+    >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, output=OnChange())
+    >>> savings.run("2024-1-1", "2054-1-1", output=PeriodEnd(Granularity.year))
+    """
+
+    @abstractmethod
+    def selector(self, grid: Grid) -> Callable[[int, float], bool]:
+        """@public
+        Returns a function that is called with the tick and value of every tick of a run
+        in order, and returns true if the tick is recorded. Implemented in the specific
+        classes.
+        """
+
+    def next_tick(self, grid: Grid) -> Callable[[int], int] | None:
+        """@public
+        Returns a function that is called with increasing ticks, and returns the first
+        tick from that tick on that is recorded as long as the value doesn't change. The
+        event engine uses it to jump between the recorded ticks. Policies that don't
+        implement it (None) are asked about every tick.
+        """
+        return None
+
+
+class Every(Output):
+    """@public
+    Records every n-th tick of the run.
+
+    >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, output=Every(24))
+    """
+
+    def __init__(self, n: int) -> None:
+        if n < 1:
+            raise Exception("Every(n) needs n to be at least 1.")
+        self.n = n
+
+    def selector(self, grid: Grid) -> Callable[[int, float], bool]:
+        n = self.n
+        return lambda tick, value: tick % n == 0
+
+    def next_tick(self, grid: Grid) -> Callable[[int], int]:
+        n = self.n
+        return lambda tick: -(-tick // n) * n
+
+
+class OnChange(Output):
+    """@public
+    Records only the ticks where the value differs from the tick before.
+
+    >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, output=OnChange())
+    """
+
+    def selector(self, grid: Grid) -> Callable[[int, float], bool]:
+        previous = None
+
+        def keep(tick: int, value: float) -> bool:
+            nonlocal previous
+            changed = previous is None or value != previous
+            previous = value
+            return changed
+
+        return keep
+
+    def next_tick(self, grid: Grid) -> Callable[[int], int]:
+        return lambda tick: maxsize
+
+
+class PeriodEnd(Output):
+    """@public
+    Records the last tick of every calendar period (hour, day, week, month or year), so
+    the value at the end of the period.
+
+    >>> savings.run("2024-1-1", "2054-1-1", output=PeriodEnd(Granularity.month))
+    """
+
+    def __init__(self, granularity: Granularity) -> None:
+        self.granularity = granularity
+
+    def selector(self, grid: Grid) -> Callable[[int, float], bool]:
+        following = self.next_tick(grid)
+        return lambda tick, value: following(tick) == tick
+
+    def next_tick(self, grid: Grid) -> Callable[[int], int]:
+        granularity = self.granularity
+        end = grid.ceil(granularity.floor(grid.start) + granularity.timedelta) - 1
+
+        def following(tick: int) -> int:
+            nonlocal end
+            while end < tick:
+                if end + 1 >= len(grid):
+                    end = len(grid)
+                else:
+                    period = granularity.floor(grid[end + 1]) + granularity.timedelta
+                    end = grid.ceil(period) - 1
+            return end
+
+        return following
+
+
+class Sample(Output):
+    """@public
+    Records the ticks of a coarser granularity from the start date, as if the run had
+    that granularity, but with the values of the finer simulation.
+
+    >>> savings.run("2024-1-1", "2054-1-1", output=Sample(Granularity.month))
+    """
+
+    def __init__(self, granularity: Granularity) -> None:
+        self.granularity = granularity
+
+    def selector(self, grid: Grid) -> Callable[[int, float], bool]:
+        following = self.next_tick(grid)
+        return lambda tick, value: following(tick) == tick
+
+    def next_tick(self, grid: Grid) -> Callable[[int], int]:
+        if self.granularity < grid.granularity:
+            raise Exception("Output granularity is finer than the run granularity.")
+        coarse = Grid(grid.start, None, self.granularity)
+        position, current = 0, 0
+
+        def following(tick: int) -> int:
+            nonlocal position, current
+            while current < tick:
+                position += 1
+                current = grid.ceil(coarse[position])
+            return current
+
+        return following
+
+
+class Recorder:
+    def __init__(self, policy: Output, grid: Grid, target: Any, dense: bool) -> None:
+        """@private
+        Passes the rows of a run that the output policy records on to a result or sink,
+        one row at a time. Without dense rows (the event engine), the ticks between two
+        rows have the value of the row before, and are recorded from the grid. The policy
+        is only asked about the ticks in between if it can't jump to the next recorded
+        tick. The first and last tick are always recorded.
+        """
+        self.keep = policy.selector(grid)
+        self.next_tick = None if dense else policy.next_tick(grid)
+        self.grid = grid
+        self.target = target
+        self.dense = dense
+        self.tick = -1
+        self.value = None
+        self.last = len(grid) - 1
+
+    def __record(self, tick: int, date: datetime, value: float) -> None:
+        """@private
+        Asks the policy about a tick and passes the row on if it is recorded.
+        """
+        if self.keep(tick, value) or tick == 0 or tick == self.last:
+            self.target.add_result(self.grid[tick] if date is None else date, value)
+
+    def add_result(self, date: datetime, value: float) -> None:
+        """@private
+        Handles a row, and the ticks without a row before it.
+        """
+        tick = self.tick + 1 if self.dense else self.grid.ceil(date)
+        if self.next_tick is None:
+            for skipped in range(self.tick + 1, tick):
+                self.__record(skipped, None, self.value)
+        else:
+            skipped = self.next_tick(self.tick + 1)
+            while skipped < tick:
+                self.target.add_result(self.grid[skipped], self.value)
+                skipped = self.next_tick(skipped + 1)
+        self.__record(tick, date, value)
+        self.tick, self.value = tick, value
+
+    def add_results(self, dates: list[datetime], values: list[float]) -> None:
+        """@private
+        Handles a list of rows.
+        """
+        for date, value in zip(dates, values):
+            self.add_result(date, value)
+
+
+def output_policy(output: Output | Granularity) -> Output:
+    """@private
+    Accepts an output policy or a granularity to sample and returns an output policy.
+    """
+    if isinstance(output, Granularity):
+        return Sample(output)
+    if not isinstance(output, Output):
+        raise Exception("Output " + str(output) + " is not an Output or Granularity.")
+    return output
@@ -0,0 +1,187 @@
+from array import array
+from bisect import bisect_right
+from typing import Any
+
+from pylan.context import apply_operation
+from pylan.engine import Engine, nested_events, projection_events
+from pylan.grid import Grid
+from pylan.result import Result
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def compile_program(context: Any, grid: Grid) -> tuple[list, list, list, dict]:
+    """@private
+    Expands the schedules of a run once into a program: for every tick with events, a
+    list of (target, operation, source) steps on slots. Slot 0 is the item value, the
+    other slots hold the projection values, so only the slots differ between the
+    combinations of a sweep. Returns the initial slots, the ticks, the steps per tick and
+    the slot of every projection.
+    """
+    states = context.states
+    slots = [context.value]
+    slot_of = {}
+    for state in states + [nested for parent in states for nested in parent.projections]:
+        if state.operation is None:
+            raise Exception(type(state.projection).__name__ + " can't be compiled.")
+        if id(state.projection) not in slot_of:
+            slot_of[id(state.projection)] = len(slots)
+            slots.append(state.value)
+
+    nested = [nested_events(state, grid) for state in states]
+    positions = [0] * len(states)
+    ticks, steps = [], []
+    for tick, index in projection_events(states, grid):
+        if not ticks or ticks[-1] != tick:
+            ticks.append(tick)
+            steps.append([])
+        state = states[index]
+        position = positions[index]
+        while position < len(nested[index]) and nested[index][position][0] <= tick:
+            child = nested[index][position][1]
+            target, source = slot_of[id(state.projection)], slot_of[id(child.projection)]
+            steps[-1].append((target, child.operation, source))
+            position += 1
+        positions[index] = position
+        steps[-1].append((0, state.operation, slot_of[id(state.projection)]))
+    return slots, ticks, steps, slot_of
+
+
+def run_program(steps: list[list[tuple]], slots: list[float]) -> array:
+    """@private
+    Runs the steps of a program on a copy of the slots. Returns the start value and the
+    item value after every tick with events.
+    """
+    slots = list(slots)
+    values = array("d", [slots[0]])
+    for tick_steps in steps:
+        for target, operation, source in tick_steps:
+            slots[target] = apply_operation(operation, slots[target], slots[source])
+        values.append(slots[0])
+    return values
+
+
+class Plan:
+    """@public
+    Outputted by Item.compile(). A run that is parsed, validated and expanded once into a
+    list of numeric steps on the ticks with events. Running a plan only does the
+    arithmetic, so it can be run many times with other start values or projection values.
+    Plans don't hold the item or its projections, they can't be changed after compiling
+    and are cheap to pickle (e.g. to send to worker processes).
+
+    >>> plan = savings.compile("2024-1-1", "2054-1-1", Granularity.day)
+    >>> plan.run()
+    >>> plan.run(start_value=5000, engine=Engine.vector)
+    >>> plan.run(values={plan.slot(mortgage): 1200})
+    """
+
+    def __init__(
+        self, epochs: array, slots: list, ticks: list, steps: list, slot_of: dict
+    ) -> None:
+        self.__epochs = epochs
+        self.__slots = tuple(slots)
+        self.__ticks = array("q", ticks)
+        self.__steps = tuple(tuple(tick_steps) for tick_steps in steps)
+        self.__slot_of = dict(slot_of)
+        self.__row_index = None
+
+    def __len__(self) -> int:
+        return len(self.__epochs)
+
+    @property
+    def epochs(self) -> array:
+        """@private
+        Returns the ticks of the plan as epoch microseconds.
+        """
+        return self.__epochs
+
+    @property
+    def ticks(self) -> array:
+        """@private
+        Returns the ticks with events.
+        """
+        return self.__ticks
+
+    @property
+    def steps(self) -> tuple[tuple[tuple, ...], ...]:
+        """@private
+        Returns the (target, operation, source) steps of every tick with events.
+        """
+        return self.__steps
+
+    @property
+    def slots(self) -> tuple:
+        """@public
+        Returns the initial values of the slots: the start value of the item first, then
+        the value of every projection.
+
+        >>> plan.slots[0] # start value
+        """
+        return self.__slots
+
+    def slot(self, projection: Any) -> int:
+        """@public
+        Returns the slot that holds the value of a projection of the compiled item. Only
+        available in the process that compiled the plan, the slot numbers can be sent
+        along with the plan.
+
+        >>> plan.run(values={plan.slot(mortgage): 1200})
+        """
+        if id(projection) not in self.__slot_of:
+            raise Exception("Projection " + str(projection) + " is not in the plan.")
+        return self.__slot_of[id(projection)]
+
+    def initial(self, start_value: float = None, values: dict[int, float] = None) -> list:
+        """@private
+        Returns the slots with the start value and projection values overridden.
+        """
+        slots = list(self.__slots)
+        if start_value is not None:
+            slots[0] = start_value
+        for slot, value in (values or {}).items():
+            slots[slot] = value
+        return slots
+
+    def spread(self, rows: array) -> Any:
+        """@private
+        Spreads the values after every tick with events over all ticks of the plan. The
+        row of every tick is looked up once and reused for the next runs.
+        """
+        if self.__row_index is None:
+            row_index = [bisect_right(self.__ticks, tick) for tick in range(len(self))]
+            if np is not None:
+                row_index = np.array(row_index, dtype=np.int64)
+            self.__row_index = row_index
+        if np is not None:
+            return np.frombuffer(rows)[self.__row_index]
+        return array("d", [rows[row] for row in self.__row_index])
+
+    def run(
+        self,
+        start_value: float = None,
+        values: dict[int, float] = None,
+        engine: Engine = Engine.loop,
+        dense: bool = False,
+    ) -> Result:
+        """@public
+        Runs the plan and returns the same result as Item.run() with the same engine. The
+        engine only decides which dates end up in the result, the values are computed by
+        the steps of the plan. The start value and the values of projections (by slot)
+        can be overridden.
+
+        >>> plan.run(start_value=5000)
+        >>> plan.run(engine=Engine.event) # only the dates with events
+        """
+        values = run_program(self.__steps, self.initial(start_value, values))
+        if engine != Engine.event or dense:
+            return Result.from_arrays(self.__epochs, self.spread(values))
+        rows = list(zip(self.__ticks, values[1:]))
+        if len(self) and (not rows or rows[0][0] > 0):
+            rows.insert(0, (0, values[0]))
+        if rows and rows[-1][0] < len(self) - 1:
+            rows.append((len(self) - 1, rows[-1][1]))
+        epochs = array("q", [self.__epochs[tick] for tick, _ in rows])
+        return Result.from_arrays(epochs, array("d", [value for _, value in rows]))
@@ -0,0 +1,215 @@
+from array import array
+from datetime import datetime
+from heapq import merge
+from itertools import groupby, repeat
+from operator import itemgetter
+from typing import Any, Iterator
+
+from pylan.context import ProjectionState, RunContext
+from pylan.engine import fire_ticks
+from pylan.granularity import Granularity
+from pylan.grid import Grid
+from pylan.item import Item
+from pylan.projections.transfer import Transfer
+from pylan.result import Result
+from pylan.schedule import keep_or_convert
+
+
+def schedule_key(state: Any, start: datetime, end: datetime) -> tuple:
+    """@private
+    Returns the key of the scheduled dates of a projection state in a run, projections
+    with the same key fire on the same ticks.
+    """
+    projection = state.projection
+    schedule = projection.schedule
+    return (
+        tuple(schedule) if isinstance(schedule, list) else schedule,
+        projection.bounds(start, end),
+        projection.include_start,
+    )
+
+
+class PortfolioResult:
+    """@public
+    Outputted by Portfolio.run(). Holds a result per item on the same dates, which can be
+    looked up by the name of the item, and the total of all items.
+
+    >>> result = portfolio.run("2024-1-1", "2054-1-1")
+    >>> result["savings"].final
+    >>> result.total.plot_axes()
+    >>> result.to_csv("portfolio.csv") # column per item
+    """
+
+    def __init__(self, names: list[str], epochs: array, columns: list[array]) -> None:
+        self.names = names
+        self.__epochs = epochs
+        self.__columns = dict(zip(names, columns))
+
+    def __len__(self) -> int:
+        return len(self.__epochs)
+
+    def __iter__(self) -> Iterator[tuple[str, Result]]:
+        """@public
+        Iterates over the (name, result) pairs of the items.
+
+        >>> for name, result in portfolio_result:
+        >>>     print(name, result.final)
+        """
+        for name in self.names:
+            yield name, self[name]
+
+    def __getitem__(self, name: str) -> Result:
+        """@public
+        Returns the result of an item.
+
+        >>> portfolio_result["savings"]
+        """
+        if name not in self.__columns:
+            raise Exception("Item " + str(name) + " not in portfolio.")
+        return Result.from_arrays(self.__epochs, self.__columns[name])
+
+    @property
+    def total(self) -> Result:
+        """@public
+        Returns the sum of all items as a result.
+
+        >>> portfolio_result.total.final
+        """
+        columns = list(self.__columns.values())
+        total = array("d", [sum(values) for values in zip(*columns)])
+        return Result.from_arrays(self.__epochs, total if columns else array("d"))
+
+    @property
+    def final(self) -> dict[str, float]:
+        """@public
+        Returns the last value of every item.
+
+        >>> portfolio_result.final["savings"]
+        """
+        return {name: values[-1] for name, values in self.__columns.items()}
+
+    def to_csv(self, filename: str, sep: str = ";") -> None:
+        """@public
+        Exports the results to a csv file, with a column per item.
+
+        >>> portfolio_result.to_csv("portfolio.csv")
+        """
+        schedule = Result.from_arrays(self.__epochs, array("d", [0.0]) * len(self))
+        with open(filename, "w") as f:
+            f.write(sep.join(["date"] + self.names) + "\n")
+            for date, *values in zip(schedule.schedule, *self.__columns.values()):
+                f.write(sep.join([str(date)] + [str(value) for value in values]) + "\n")
+
+
+class Portfolio:
+    """@public
+    A group of named items that run on one shared clock, with transfers that move value
+    from one item to another. All projections are merged into a single stream of events,
+    and projections with the same schedule (and start/end date) share their ticks, so
+    schedules are expanded once for the whole portfolio. On every date the projections
+    are applied in the order the items were added, then the transfers.
+
+    >>> portfolio = Portfolio()
+    >>> portfolio.add_items({"checking": checking, "savings": savings})
+    >>> portfolio.add_transfer(Transfer("1m", 500, "checking", "savings"))
+    >>> result = portfolio.run("2024-1-1", "2054-1-1")
+    """
+
+    def __init__(self) -> None:
+        self.items = {}
+        self.transfers = []
+
+    def add_item(self, name: str, item: Item) -> None:
+        """@public
+        Adds an item to the portfolio under a name.
+
+        >>> portfolio.add_item("savings", savings)
+        """
+        if name in self.items:
+            raise Exception("Item " + str(name) + " is already in portfolio.")
+        self.items[name] = item
+
+    def add_items(self, items: dict[str, Item]) -> None:
+        """@public
+        Adds a dict of named items to the portfolio.
+
+        >>> portfolio.add_items({"checking": checking, "savings": savings})
+        """
+        for name, item in items.items():
+            self.add_item(name, item)
+
+    def add_transfer(self, transfer: Transfer) -> None:
+        """@public
+        Adds a transfer between two items of the portfolio.
+
+        >>> portfolio.add_transfer(Transfer("1m", 500, "checking", "savings"))
+        """
+        for name in [transfer.source, transfer.target]:
+            if name not in self.items:
+                raise Exception("Item " + str(name) + " not in portfolio.")
+        self.transfers.append(transfer)
+
+    @property
+    def granularity(self) -> Granularity | None:
+        """@private
+        Returns the smallest granularity of the items and transfers.
+        """
+        granularities = [item.granularity for item in self.items.values()]
+        granularities += [Granularity.from_str(t.schedule) for t in self.transfers]
+        granularities = [granularity for granularity in granularities if granularity]
+        return min(granularities) if granularities else None
+
+    def run(
+        self, start: datetime | str, end: datetime | str, granularity: Granularity = None
+    ) -> PortfolioResult:
+        """@public
+        Runs all items and transfers between the start and end date in a single pass,
+        with the smallest granularity of the items if none is given. Values are the same
+        as Item.run() for items without transfers.
+
+        >>> result = portfolio.run("2024-1-1", "2054-1-1", Granularity.day)
+        """
+        start, end = keep_or_convert(start), keep_or_convert(end)
+        granularity = granularity or self.granularity
+        if granularity is None:
+            raise Exception("No projections have been added.")
+        grid = Grid(start, end, granularity)
+        names = list(self.items)
+        contexts = [RunContext(self.items[name], start, end) for name in names]
+        index = {name: i for i, name in enumerate(names)}
+        entries = [
+            (owner, state)
+            for owner, context in enumerate(contexts)
+            for state in context.states
+        ]
+        entries += [(None, ProjectionState(t, start, end)) for t in self.transfers]
+
+        shared = {}
+        streams = []
+        for order, (_, state) in enumerate(entries):
+            state.resolve(grid)
+            key = schedule_key(state, start, end)
+            if key not in shared:
+                shared[key] = fire_ticks(state.upcoming(), grid)
+            streams.append(zip(shared[key], repeat(order)))
+
+        columns = [array("d") for _ in names]
+        next_tick = 0
+        for tick, events in groupby(merge(*streams), itemgetter(0)):
+            for context, column in zip(contexts, columns):
+                column.extend(array("d", [context.value]) * (tick - next_tick))
+            for _, order in events:
+                owner, state = entries[order]
+                if state.projections:
+                    state.update_value(tick)
+                if owner is None:
+                    contexts[index[state.projection.source]].value -= state.value
+                    contexts[index[state.projection.target]].value += state.value
+                else:
+                    state.apply(contexts[owner])
+            for context, column in zip(contexts, columns):
+                column.append(context.value)
+            next_tick = tick + 1
+        for context, column in zip(contexts, columns):
+            column.extend(array("d", [context.value]) * (len(grid) - next_tick))
+        return PortfolioResult(names, grid.epochs(), columns)
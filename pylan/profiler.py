@@ -0,0 +1,186 @@
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Callable, Iterator
+
+from pylan.context import ProjectionState
+from pylan.grid import Grid
+
+
+class Profiler:
+    """@public
+    Collects counters and timings of Item.run(), Item.iterate() and Item.until(), to find
+    the projections that make a run slow. Per projection it counts the ticks polled, the
+    events applied, the scheduled dates passed and the value updates of nested
+    projections, with the time spent in them (including nested projections). The vector
+    engine applies events in bulk, so those are not counted. Per phase (setup, resolve,
+    run, output) it keeps the total time, where resolve (nested timelines) is part of
+    run. An optional trace callback is called with (projection, old value, new value)
+    for every applied event. Runs without a profiler are not instrumented at all.
+
+    >>> profiler = Profiler()
+    >>> savings.run("2024-1-1", "2054-1-1", profiler=profiler)
+    >>> print(profiler) # table with the slowest projections first
+    >>> profiler.report()["projections"][0]["events"]
+    >>> Profiler(trace=lambda projection, old, new: print(projection, old, new))
+    """
+
+    def __init__(self, trace: Callable[[Any, Any, Any], None] = None) -> None:
+        self.trace = trace
+        self.phases = {}
+        self.projections = []
+
+    def __str__(self) -> str:
+        lines = [f"{'phase':32} {'seconds':>10}"]
+        for name, seconds in self.phases.items():
+            lines.append(f"{name:32} {seconds:>10.4f}")
+        lines.append("")
+        lines.append(
+            f"{'projection':32} {'seconds':>10} {'polls':>10} {'events':>8} "
+            f"{'dates':>8} {'updates':>8}"
+        )
+        for row in self.report()["projections"]:
+            lines.append(
+                f"{row['name']:32} {row['seconds']:>10.4f} {row['polls']:>10} "
+                f"{row['events']:>8} {row['dates']:>8} {row['updates']:>8}"
+            )
+        return "\n".join(lines)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """@public
+        Adds the time spent in the with block to a phase.
+
+        >>> with profiler.phase("plot"):
+        >>>     plt.plot(*result.plot_axes())
+        """
+        begin = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, perf_counter() - begin)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """@private
+        Adds seconds to the total time of a phase.
+        """
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def state(
+        self, projection: Any, start: datetime, end: datetime = None, depth: int = 0
+    ) -> ProjectionState:
+        """@private
+        Creates the instrumented state of a projection for a run.
+        """
+        return ProfiledState(projection, start, end, self, depth)
+
+    def report(self) -> dict[str, Any]:
+        """@public
+        Returns the phase timings and the counters of every projection, sorted with the
+        slowest projection first. Nested projections have a depth above 0. Projections
+        are counted separately for every run the profiler is passed to.
+
+        >>> slowest = profiler.report()["projections"][0]
+        >>> slowest["name"], slowest["seconds"], slowest["polls"]
+        """
+        rows = [vars(stats).copy() for stats in self.projections]
+        rows.sort(key=lambda row: row["seconds"], reverse=True)
+        return {"phases": dict(self.phases), "projections": rows}
+
+
+class ProjectionStats:
+    def __init__(self, projection: Any, depth: int) -> None:
+        """@private
+        Counters of a projection during a run.
+        """
+        name = type(projection).__name__ + "(" + str(projection.schedule)
+        self.name = name + ", " + str(projection.value) + ")"
+        self.depth = depth
+        self.polls = 0
+        self.events = 0
+        self.dates = 0
+        self.updates = 0
+        self.seconds = 0.0
+
+
+class ProfiledState(ProjectionState):
+    def __init__(
+        self,
+        projection: Any,
+        start: datetime,
+        end: datetime,
+        profiler: Profiler,
+        depth: int = 0,
+    ) -> None:
+        """@private
+        Projection state that counts and times what happens to it during a run. Only
+        used when a profiler is passed, so regular runs keep the plain state.
+        """
+        self.profiler = profiler
+        self.depth = depth
+        self.stats = ProjectionStats(projection, depth)
+        profiler.projections.append(self.stats)
+        begin = perf_counter()
+        super().__init__(projection, start, end)
+        self.stats.seconds += perf_counter() - begin
+
+    def nested_state(self, projection: Any, start: datetime, end: datetime) -> Any:
+        """@private
+        Nested projections are instrumented as well.
+        """
+        return self.profiler.state(projection, start, end, self.depth + 1)
+
+    def apply(self, target: Any) -> None:
+        """@private
+        Counts and traces the applied event.
+        """
+        begin = perf_counter()
+        old = target.value
+        super().apply(target)
+        self.stats.events += 1
+        self.stats.seconds += perf_counter() - begin
+        if self.profiler.trace is not None:
+            self.profiler.trace(self.projection, old, target.value)
+
+    def resolve(self, grid: Grid) -> None:
+        """@private
+        Times the resolve phase.
+        """
+        begin = perf_counter()
+        super().resolve(grid)
+        seconds = perf_counter() - begin
+        self.stats.seconds += seconds
+        self.profiler.add_time("resolve", seconds)
+
+    def update_value(self, tick: int) -> None:
+        """@private
+        Counts the value updates from the nested projections.
+        """
+        change = self.next_change
+        super().update_value(tick)
+        if change is not self.next_change:
+            self.stats.updates += 1
+
+    def scheduled(self, tick: int) -> bool:
+        """@private
+        Counts and times the polls of the loop engine, Item.iterate() and Item.until().
+        """
+        begin = perf_counter()
+        fired = super().scheduled(tick)
+        self.stats.polls += 1
+        self.stats.seconds += perf_counter() - begin
+        return fired
+
+    def advance(self) -> None:
+        """@private
+        Counts the streamed dates of the schedule.
+        """
+        super().advance()
+        self.stats.dates += 1
+
+
+def phase(profiler: Profiler | None, name: str) -> Any:
+    """@private
+    Times a phase of a run if a profiler is passed.
+    """
+    return nullcontext() if profiler is None else profiler.phase(name)
@@ -2,7 +2,8 @@ from abc import ABC, abstractmethod
 from datetime import datetime
 from typing import Any
 
-from pylan.schedule import keep_or_convert, timedelta_from_schedule, timedelta_from_str
+from pylan.distributions import Distribution
+from pylan.schedule import keep_or_convert, timedelta_from_str
 
 
 class Projection(ABC):
@@ -13,38 +14,45 @@ class Projection(ABC):
     - Multiply(schedule, value)
     - Divide(schedule, value)
     - Replace(schedule, value)
+    - Transfer(schedule, value, source, target), between the items of a portfolio
 
     Note, all implementations have the following optional parameters:
     - start_date: str or datetime with the minimum date for the projection to start
     - end_date: str or datetime, max date for the projection
     - offset: str, offsets each occurence of the projection based on the start date
 
+    The value can also be a distribution (see Distribution), in which case Item.simulate()
+    draws a value each time the projection is applied and Item.run() uses the mean.
+    Projections only hold the definition (the state of a run is kept in a RunContext), so
+    the same projection can be used by multiple items and threads at once.
+
     >>> mortgage = Subtract("0 0 2 * *", 1500)  # cron support
     >>> inflation = Divide(["2025-1-1", "2026-1-1", "2027-1-1"], 1.08)
     """
 
+    operation = None
+
     def __init__(
         self,
         schedule: Any,
-        value: float | int,
+        value: float | int | Distribution,
         start_date: str | datetime = None,
         end_date: str | datetime = None,
         offset: str = None,
         include_start: bool = False,
     ) -> None:
         self.schedule = schedule
+        self.distribution = value if isinstance(value, Distribution) else None
+        if self.distribution:
+            value = self.distribution.mean
         self.value = value
         self.include_start = include_start
-        self.iterations = 0
-        self.dt_schedule = []
         self.projections = []
 
         self.start_date = start_date
         self.offset = offset
         self.end_date = end_date
 
-        self.__backup_value = value
-
     @abstractmethod
     def apply(self) -> None:
         """@public
@@ -60,57 +68,13 @@ class Projection(ABC):
         """
         self.projections.append(projection)
 
-    def update_value(self, current: datetime) -> None:
-        """@private
-        Grows the value the amount of times that it was scheduled in the past.
-        """
-        for projection in self.projections:
-            try:
-                while projection.dt_schedule[projection.iterations] < current:
-                    projection.apply(self)
-                    projection.iterations += 1
-            except IndexError:
-                pass
-
-    def scheduled(self, current: datetime) -> bool:
-        """@public
-        Returns true if projection is scheduled on the provided date.
-        """
-        if self.projections:
-            self.update_value(current)
-        if not self.dt_schedule:
-            return False
-        if self.iterations >= len(self.dt_schedule):
-            return False
-        if current >= self.dt_schedule[self.iterations]:
-            self.iterations += 1
-            return True
-        return False
-
-    def setup(self, start: datetime, end: datetime, iterative: bool = False) -> None:
-        """@private
-        Iterates between start and end date and returns sets the list of datetimes that
-        the projection is scheduled. Note, the model is iterative for until() computes. In
-        these cases the values and iterations should not be reset.
-        """
-        if not iterative:
-            self.value = self.__backup_value
-            self.iterations = 0
-        start, end = self.__apply_date_settings(start, end)
-        self.dt_schedule = timedelta_from_schedule(
-            self.schedule, start, end, self.include_start
-        )
-        [projection.setup(start, end, iterative) for projection in self.projections]
-
-    def __apply_date_settings(
-        self, start: datetime, end: datetime
-    ) -> tuple[datetime, datetime]:
+    def bounds(self, start: datetime, end: datetime) -> tuple[datetime, datetime]:
         """@private
         Checks if the optional start/end date variables are set and returns updated value.
         """
         if self.start_date and keep_or_convert(self.start_date) > start:
             start = keep_or_convert(self.start_date)
-        if self.end_date and keep_or_convert(self.end_date) < end:
+        if self.end_date and (end is None or keep_or_convert(self.end_date) < end):
             end = keep_or_convert(self.end_date)
         if self.offset:
             start += timedelta_from_str(self.offset)
@@ -3,6 +3,8 @@ from pylan.projections import Projection
 
 
 class Add(Projection):
+    operation = "add"
+
     def apply(self, item: Item | Projection) -> None:
         """@private
         Adds the projection value to the item (or projection) value.
@@ -3,6 +3,8 @@ from pylan.projections import Projection
 
 
 class Divide(Projection):
+    operation = "divide"
+
     def apply(self, item: Item) -> None:
         """@private
         Adds the projection value to the item value.
@@ -3,6 +3,8 @@ from pylan.projections import Projection
 
 
 class Multiply(Projection):
+    operation = "multiply"
+
     def apply(self, item: Item) -> None:
         """@private
         Adds the projection value to the item value.
@@ -3,6 +3,8 @@ from pylan.projections import Projection
 
 
 class Replace(Projection):
+    operation = "replace"
+
     def apply(self, item: Item) -> None:
         """@private
         Replaces the projection value with the item value.
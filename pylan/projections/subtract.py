@@ -3,6 +3,8 @@ from pylan.projections import Projection
 
 
 class Subtract(Projection):
+    operation = "subtract"
+
     def apply(self, item: Item) -> None:
         """@private
         Adds the projection value to the item value.
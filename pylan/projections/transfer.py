@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Any
+
+from pylan.distributions import Distribution
+from pylan.projections import Projection
+
+
+class Transfer(Projection):
+    """@public
+    Moves the value from one item to another item of a portfolio, by the names of the
+    items in the portfolio. Only applies in Portfolio.run(), after the projections of
+    the items on the same date.
+
+    >>> portfolio.add_transfer(Transfer("1m", 500, "checking", "savings"))
+    """
+
+    def __init__(
+        self,
+        schedule: Any,
+        value: float | int | Distribution,
+        source: str,
+        target: str,
+        start_date: str | datetime = None,
+        end_date: str | datetime = None,
+        offset: str = None,
+        include_start: bool = False,
+    ) -> None:
+        super().__init__(schedule, value, start_date, end_date, offset, include_start)
+        self.source = source
+        self.target = target
+
+    def apply(self, item: Any) -> None:
+        """@private
+        Transfers need a source and target item, so they can't be applied to one item.
+        """
+        raise Exception("Transfers can only be applied in a portfolio.")
@@ -0,0 +1,202 @@
+from abc import ABC, abstractmethod
+from copy import copy
+from datetime import datetime
+from typing import Any
+
+
+class Reducer(ABC):
+    """@public
+    Reducer is an abstract base class for the aggregates that Item.run() can compute while
+    it runs, in constant time per row and without creating a result. Implementations:
+    - Min(): lowest value
+    - Max(): highest value
+    - Drawdown(): largest drop from a previous high
+    - Crossing(threshold, below=True): first date below (or above) the threshold
+    - Inflow(): total amount of the Add projections that were applied
+    - Outflow(): total amount of the Subtract projections that were applied
+
+    Reducers only hold the definition, every run works on a copy, so the same reducers can
+    be used for many runs. With the event engine only the dates with events are reduced,
+    which gives the same aggregates as reducing every tick. Reducers that set events
+    (such as Inflow) are also passed every projection that is applied to the item, by all
+    engines.
+
+    >>> checks = {"lowest": Min(), "broke": Crossing(0), "drawdown": Drawdown()}
+    >>> aggregates = savings.run("2024-1-1", "2054-1-1", reducers=checks)
+    >>> aggregates["broke"]
+    """
+
+    events = False
+
+    def __init__(self) -> None:
+        self.reset()
+
+    @abstractmethod
+    def reset(self) -> None:
+        """@public
+        Sets the value back to the value before the first row. Implemented in the specific
+        classes.
+        """
+
+    @abstractmethod
+    def update(self, date: datetime, value: float) -> None:
+        """@public
+        Updates the aggregate with the next row of a run. Implemented in the specific
+        classes.
+        """
+
+    def apply(self, projection: Any, value: float) -> None:
+        """@public
+        Updates the aggregate with a projection that is applied to the item, with the
+        value of the projection in the run. Only called if events is set.
+        """
+
+
+class Min(Reducer):
+    """@public
+    Lowest value of the run.
+
+    >>> savings.run("2024-1-1", "2054-1-1", reducers={"lowest": Min()})
+    """
+
+    def reset(self) -> None:
+        self.value = None
+
+    def update(self, date: datetime, value: float) -> None:
+        if self.value is None or value < self.value:
+            self.value = value
+
+
+class Max(Reducer):
+    """@public
+    Highest value of the run.
+
+    >>> savings.run("2024-1-1", "2054-1-1", reducers={"highest": Max()})
+    """
+
+    def reset(self) -> None:
+        self.value = None
+
+    def update(self, date: datetime, value: float) -> None:
+        if self.value is None or value > self.value:
+            self.value = value
+
+
+class Drawdown(Reducer):
+    """@public
+    Largest drop of the value from a previous high, as an amount (0 if the value never
+    drops).
+
+    >>> savings.run("2024-1-1", "2054-1-1", reducers={"drawdown": Drawdown()})
+    """
+
+    def reset(self) -> None:
+        self.peak = None
+        self.value = 0.0
+
+    def update(self, date: datetime, value: float) -> None:
+        if self.peak is None or value > self.peak:
+            self.peak = value
+        elif self.peak - value > self.value:
+            self.value = self.peak - value
+
+
+class Crossing(Reducer):
+    """@public
+    First date where the value is below the threshold (or above, if below is false), None
+    if it never is.
+
+    >>> savings.run("2024-1-1", "2054-1-1", reducers={"broke": Crossing(0)})
+    >>> savings.run("2024-1-1", "2054-1-1", reducers={"rich": Crossing(1e6, below=False)})
+    """
+
+    def __init__(self, threshold: float, below: bool = True) -> None:
+        self.threshold = threshold
+        self.below = below
+        super().__init__()
+
+    def reset(self) -> None:
+        self.value = None
+
+    def update(self, date: datetime, value: float) -> None:
+        if self.value is None:
+            if value < self.threshold if self.below else value > self.threshold:
+                self.value = date
+
+
+class Inflow(Reducer):
+    """@public
+    Total amount of the Add projections applied during the run (e.g. income), so without
+    the growth from multiplications and not netted against subtractions.
+
+    >>> savings.run("2024-1-1", "2054-1-1", reducers={"income": Inflow()})
+    """
+
+    events = True
+    operation = "add"
+
+    def reset(self) -> None:
+        self.value = 0.0
+
+    def update(self, date: datetime, value: float) -> None:
+        pass
+
+    def apply(self, projection: Any, value: float) -> None:
+        if projection.operation == self.operation:
+            self.value += value
+
+
+class Outflow(Inflow):
+    """@public
+    Total amount of the Subtract projections applied during the run (e.g. spending), as
+    a positive amount.
+
+    >>> savings.run("2024-1-1", "2054-1-1", reducers={"spent": Outflow()})
+    """
+
+    operation = "subtract"
+
+
+class Reduction:
+    def __init__(self, reducers: dict[str, Reducer]) -> None:
+        """@private
+        Passes the rows of a run to fresh copies of the reducers, in place of a result or
+        sink, so the rows are never stored.
+        """
+        self.reducers = {}
+        for name, reducer in reducers.items():
+            if not isinstance(reducer, Reducer):
+                raise Exception("Reducer " + str(reducer) + " is not a Reducer.")
+            self.reducers[name] = copy(reducer)
+            self.reducers[name].reset()
+        self.updates = [reducer.update for reducer in self.reducers.values()]
+        self.appliers = [r.apply for r in self.reducers.values() if r.events]
+        self.events = bool(self.appliers)
+
+    def add_result(self, date: datetime, value: float) -> None:
+        """@private
+        Updates every reducer with a row.
+        """
+        for update in self.updates:
+            update(date, value)
+
+    def add_results(self, dates: list[datetime], values: list[float]) -> None:
+        """@private
+        Updates every reducer with a list of rows.
+        """
+        for update in self.updates:
+            for date, value in zip(dates, values):
+                update(date, value)
+
+    def add_event(self, state: Any) -> None:
+        """@private
+        Passes a projection that is applied to the item to the reducers with events.
+        """
+        for apply in self.appliers:
+            apply(state.projection, state.value)
+
+    def values(self) -> dict[str, Any]:
+        """@private
+        Returns the aggregate of every reducer by name.
+        """
+        return {name: reducer.value for name, reducer in self.reducers.items()}
@@ -1,59 +1,294 @@
-from dataclasses import dataclass, field
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
 from datetime import datetime
-from typing import Optional
+from math import fsum
+from mmap import ACCESS_READ, mmap
+from struct import calcsize, pack, unpack
+from typing import Any, Iterator
 
-from pylan.schedule import keep_or_convert
+from pylan.granularity import Granularity
+from pylan.schedule import from_epoch, keep_or_convert, to_epoch
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BATCH_SIZE = 10000
+
+FILE_MAGIC = b"PYLANRES"
+FILE_HEADER = "<8sQqBB"
+FILE_HEADER_SIZE = 64
+
+
+def little_endian(column: Any) -> Any:
+    """@private
+    Returns the column with little endian byte order, as stored in result files.
+    """
+    if sys.byteorder == "little":
+        return column
+    swapped = array(memoryview(column).format, column)
+    swapped.byteswap()
+    return swapped
+
+
+AGGREGATES = {
+    "first": lambda values: values[0],
+    "last": lambda values: values[-1],
+    "mean": lambda values: sum(values) / len(values),
+    "sum": sum,
+    "min": min,
+    "max": max,
+}
+
+
+def add_exact(partials: list[float], value: float) -> None:
+    """@private
+    Adds a value to a sum that is kept exactly as a list of non-overlapping floats
+    (Shewchuk's algorithm, as used by math.fsum), so values can also be taken out again
+    without rounding errors.
+    """
+    index = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[index] = low
+            index += 1
+        value = high
+    partials[index:] = [value]
+
+
+def rolling_window(values: Any, window: int, how: str) -> array:
+    """@private
+    Rolling windows of Result.rolling(), in a single pass with an exact running sum
+    (sum/mean, also used with numpy) or a queue of the candidates (min/max, Python
+    version).
+    """
+    rolled = array("d")
+    if how in ["sum", "mean"]:
+        partials = []
+        for index, value in enumerate(values):
+            add_exact(partials, value)
+            if index >= window:
+                add_exact(partials, -values[index - window])
+            if index >= window - 1:
+                total = fsum(partials)
+                rolled.append(total / window if how == "mean" else total)
+        return rolled
+    candidates = deque()
+    for index, value in enumerate(values):
+        while candidates and (
+            value <= values[candidates[-1]]
+            if how == "min"
+            else value >= values[candidates[-1]]
+        ):
+            candidates.pop()
+        candidates.append(index)
+        if candidates[0] <= index - window:
+            candidates.popleft()
+        if index >= window - 1:
+            rolled.append(values[candidates[0]])
+    return rolled
 
 
-@dataclass
 class Result:
     """@public
     Outputted by an item run. Result of a simulation between start and end date. Has the
-    schedule and values as attributes (which are both lists).
+    schedule and values as attributes (which are both lists). Internally the result is
+    stored column wise in compact arrays (dates as epoch microseconds, values as float64).
+    Looking up a date is O(1) for results with a fixed step size and a binary search
+    otherwise. Slicing by date returns a view on the same arrays, both dates included.
+    Values are stored as floats. Adding rows to a result while slices of it are used
+    copies its arrays first, the slices keep the rows they had.
 
     >>> result = savings.run("2024-1-1", "2024-3-1")
     >>> x, y = result.plot_axes() # can be used for matplotlib
     >>> result.final # last value
+    >>> result["2024-1-1":"2024-2-1"] # view with the values in january
+    >>> dates, values = result.arrays # numpy arrays, without copying
+    >>> result.resample(Granularity.year, "mean") # yearly averages
     >>> result.to_csv("test.csv")
+    >>> result.save("test.res") # binary, see Result.load()
     """
 
-    schedule: Optional[list[datetime]] = field(default_factory=list)
-    values: Optional[list[float]] = field(default_factory=list)
+    def __init__(
+        self, schedule: list[datetime] = None, values: list[float] = None
+    ) -> None:
+        self.__epochs = array("q")
+        self.__values = array("d")
+        self.__step = None
+        self.__regular = True
+        self.__sorted = True
+        self.__view = False
+        for date, value in zip(schedule or [], values or []):
+            self.add_result(date, value)
+
+    @classmethod
+    def from_arrays(cls, epochs: Any, values: Any) -> Any:
+        """@private
+        Creates a result from arrays with epoch microseconds and values, without
+        converting every date to a datetime object.
+        """
+        result = cls()
+        result.__epochs.frombytes(memoryview(epochs).cast("B"))
+        result.__values.frombytes(memoryview(values).cast("B"))
+        result.__check_grid()
+        return result
+
+    def __check_grid(self) -> None:
+        """@private
+        Checks if the dates are sorted and have a fixed step size.
+        """
+        epochs = self.__epochs
+        if np is not None and len(epochs) > 1:
+            steps = np.diff(np.frombuffer(epochs, dtype=np.int64))
+            self.__step = int(steps[0])
+            self.__regular = bool((steps == steps[0]).all())
+            self.__sorted = bool((steps > 0).all())
+        elif len(epochs) > 1:
+            steps = [b - a for a, b in zip(epochs, epochs[1:])]
+            self.__step = steps[0]
+            self.__regular = all(step == steps[0] for step in steps)
+            self.__sorted = all(step > 0 for step in steps)
+
+    def __view_of(self, start: int, stop: int) -> Any:
+        """@private
+        Returns a result that shares the arrays of this result between two indices.
+        """
+        result = Result()
+        result.__epochs = memoryview(self.__epochs)[start:stop]
+        result.__values = memoryview(self.__values)[start:stop]
+        result.__step = self.__step
+        result.__regular = self.__regular
+        result.__sorted = self.__sorted
+        result.__view = True
+        return result
+
+    @property
+    def schedule(self) -> list[datetime]:
+        """@private
+        The dates of the result as a list of datetime objects.
+        """
+        if np is not None:
+            epochs = np.frombuffer(self.__epochs, dtype=np.int64)
+            return epochs.astype("datetime64[us]").tolist()
+        return [from_epoch(epoch) for epoch in self.__epochs]
+
+    @property
+    def values(self) -> list[float]:
+        """@private
+        The values of the result as a list.
+        """
+        return self.__values.tolist()
+
+    @property
+    def arrays(self) -> tuple[Any, Any]:
+        """@public
+        Returns the dates (datetime64) and values (float64) as numpy arrays that share the
+        memory of the result. Without numpy, the raw epoch (microseconds) and value arrays
+        are returned.
+
+        >>> dates, values = result.arrays
+        """
+        if np is None:
+            return self.__epochs, self.__values
+        epochs = np.frombuffer(self.__epochs, dtype=np.int64)
+        return epochs.view("datetime64[us]"), np.frombuffer(self.__values, dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.__values)
+
+    def __iter__(self) -> Iterator[tuple[datetime, float]]:
+        """@public
+        Iterates over the (date, value) pairs of the result. Dates are created in batches,
+        so iterating a result larger than memory (see Result.load()) is possible.
+
+        >>> for date, value in result:
+        >>>     print(date, value)
+        """
+        for begin in range(0, len(self), BATCH_SIZE):
+            batch = self.__view_of(begin, begin + BATCH_SIZE)
+            yield from zip(batch.schedule, batch.values)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Result):
+            return NotImplemented
+        return self.__epochs == other.__epochs and self.__values == other.__values
+
+    def __row(self, index: int) -> str:
+        """@private
+        Returns a row of the string format of the result.
+        """
+        date = from_epoch(self.__epochs[index])
+        return str(index) + "\t" + str(date) + "\t" + str(self.__values[index]) + "\n"
 
     def __str__(self) -> str:
         """@public
         String format of result is a column oriented table with dates and values.
         """
-        str_result = ""
-        for index, (date, value) in enumerate(zip(self.schedule, self.values)):
-            str_result += str(index) + "\t" + str(date) + "\t" + str(value) + "\n"
-        return str_result
+        rows = zip(range(len(self)), self.schedule, self.values)
+        return "".join(
+            [
+                str(index) + "\t" + str(date) + "\t" + str(value) + "\n"
+                for index, date, value in rows
+            ]
+        )
 
     def __repr__(self) -> str:
         """@public
         String format of result is a column oriented table with dates and values.
         """
-        str_result = ""
-        seperator = False
-        for index, (date, value) in enumerate(zip(self.schedule, self.values)):
-            if index < 5 or index > len(self.values) - 6:
-                str_result += str(index) + "\t" + str(date) + "\t" + str(value) + "\n"
-            elif not seperator:
-                str_result += "...\n"
-                seperator = True
-        return str_result
-
-    def __getitem__(self, key: str | datetime) -> float | int:
+        rows = [self.__row(index) for index in range(min(5, len(self)))]
+        if len(self) > 10:
+            rows.append("...\n")
+        rows += [self.__row(index) for index in range(max(5, len(self) - 5), len(self))]
+        return "".join(rows)
+
+    def __index(self, epoch: int) -> int:
+        """@private
+        Returns the index of an epoch, or -1 if the epoch is not in the result.
+        """
+        epochs = self.__epochs
+        if not len(epochs):
+            return -1
+        if self.__regular and self.__step:
+            index, remainder = divmod(epoch - epochs[0], self.__step)
+            return index if not remainder and 0 <= index < len(epochs) else -1
+        if self.__sorted:
+            index = bisect_left(epochs, epoch)
+            return index if index < len(epochs) and epochs[index] == epoch else -1
+        for index, other in enumerate(epochs):
+            if other == epoch:
+                return index
+        return -1
+
+    def __getitem__(self, key: str | datetime | slice) -> float | Any:
         """@public
-        Get a result by the date using a dict key.
+        Get a result by the date using a dict key. Slicing with dates returns a view of
+        the result between the two dates (both included).
 
         >>> print(result["2024-5-5"])
+        >>> print(result["2024-5-5":"2024-6-5"])
         """
-        key = keep_or_convert(key)
-        for date, value in zip(self.schedule, self.values):
-            if date == key:
-                return value
-        raise Exception("Date not found in result.")
+        if isinstance(key, slice):
+            if not self.__sorted:
+                raise Exception("Can't slice a result with unsorted dates.")
+            start = 0
+            stop = len(self.__epochs)
+            if key.start is not None:
+                start = bisect_left(self.__epochs, to_epoch(keep_or_convert(key.start)))
+            if key.stop is not None:
+                stop = bisect_right(self.__epochs, to_epoch(keep_or_convert(key.stop)))
+            return self.__view_of(start, max(start, stop))
+        index = self.__index(to_epoch(keep_or_convert(key)))
+        if index < 0:
+            raise Exception("Date not found in result.")
+        return self.__values[index]
 
     @property
     def final(self):
@@ -63,14 +298,119 @@ class Result:
         >>> result = savings.run("2024-1-1", "2024-3-1")
         >>> result.final
         """
-        return self.values[-1:][0]
+        return self.__values[-1]
 
     @property
     def valid(self):
         """@public
         Returns true if the result has a valid format
         """
-        return len(self.schedule) == len(self.values)
+        return len(self.__epochs) == len(self.__values)
+
+    def resample(self, granularity: Granularity, how: str = "last") -> Any:
+        """@public
+        Returns a result with a row per hour/day/week/month/year, dated at the start of
+        the period, with the first, last, mean, sum, min or max of the values in the
+        period. Periods without values are left out.
+
+        >>> result.resample(Granularity.month) # value at the end of every month
+        >>> result.resample(Granularity.year, "mean")
+        """
+        if how not in AGGREGATES:
+            raise Exception("Can't resample with " + str(how) + ".")
+        if not self.__sorted:
+            raise Exception("Can't resample a result with unsorted dates.")
+        if not len(self.__epochs):
+            return Result()
+        epochs, values = self.__epochs, self.__values
+        periods = array("q")
+        date, last = granularity.floor(from_epoch(epochs[0])), from_epoch(epochs[-1])
+        while date <= last:
+            periods.append(to_epoch(date))
+            date += granularity.timedelta
+        if np is None:
+            starts = [bisect_left(epochs, period) for period in periods]
+            rows = [
+                (period, AGGREGATES[how](values[start:end]))
+                for period, start, end in zip(periods, starts, starts[1:] + [len(epochs)])
+                if start < end
+            ]
+            return Result.from_arrays(
+                array("q", [period for period, _ in rows]),
+                array("d", [value for _, value in rows]),
+            )
+        epochs = np.frombuffer(epochs, dtype=np.int64)
+        values = np.frombuffer(values, dtype=float)
+        starts = np.searchsorted(epochs, np.frombuffer(periods, dtype=np.int64))
+        ends = np.append(starts[1:], len(epochs))
+        periods = np.frombuffer(periods, dtype=np.int64)[starts < ends]
+        starts, ends = starts[starts < ends], ends[starts < ends]
+        if how == "first":
+            resampled = values[starts]
+        elif how == "last":
+            resampled = values[ends - 1]
+        elif how == "min":
+            resampled = np.minimum.reduceat(values, starts)
+        elif how == "max":
+            resampled = np.maximum.reduceat(values, starts)
+        else:
+            resampled = np.add.reduceat(values, starts)
+            if how == "mean":
+                resampled = resampled / (ends - starts)
+        return Result.from_arrays(periods, np.ascontiguousarray(resampled))
+
+    def rolling(self, window: int, how: str = "mean") -> Any:
+        """@public
+        Returns a result with the mean, sum, min or max of the last window values (rows,
+        including the current one) on every date. The first window - 1 dates are left
+        out. Sums are exact (rounded once, like math.fsum), so the values are the same
+        with and without numpy.
+
+        >>> result.rolling(30) # 30 day moving average of a daily run
+        >>> result.rolling(12, "min") # lowest value of the last 12 rows
+        """
+        if how not in ["mean", "sum", "min", "max"]:
+            raise Exception("Can't roll with " + str(how) + ".")
+        if window < 1:
+            raise Exception("Window needs to be at least 1.")
+        if window > len(self.__values):
+            return Result()
+        epochs = self.__epochs[window - 1 :]
+        if np is None or how in ["mean", "sum"]:
+            return Result.from_arrays(
+                epochs, rolling_window(self.__values, window, how)
+            )
+        values = np.frombuffer(self.__values, dtype=float)
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        return Result.from_arrays(epochs, getattr(windows, how)(axis=1))
+
+    def growth(self, periods: int = 1) -> Any:
+        """@public
+        Returns a result with the relative change of the value compared to periods rows
+        before (NaN if that value is 0). The first periods dates are left out. E.g. year
+        over year growth of a yearly resample.
+
+        >>> result.resample(Granularity.year).growth()
+        """
+        if periods < 1:
+            raise Exception("Periods needs to be at least 1.")
+        if periods >= len(self.__values):
+            return Result()
+        values = self.__values
+        if np is None:
+            changes = array(
+                "d",
+                [
+                    value / previous - 1 if previous else float("nan")
+                    for previous, value in zip(values, values[periods:])
+                ],
+            )
+            return Result.from_arrays(self.__epochs[periods:], changes)
+        values = np.frombuffer(values, dtype=float)
+        previous, current = values[:-periods], values[periods:]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            changes = np.where(previous != 0, current / previous - 1, np.nan)
+        return Result.from_arrays(self.__epochs[periods:], changes)
 
     def plot_axes(self, categorical_x_axis: bool = False) -> tuple[list, list]:
         """@public
@@ -88,16 +428,123 @@ class Result:
 
         Adds value/date to the result object.
         """
-        self.schedule.append(date)
-        self.values.append(value)
+        if self.__view:
+            raise Exception("Can't add results to a view of a result.")
+        epoch, value = to_epoch(date), float(value)
+        if len(self.__epochs):
+            step = epoch - self.__epochs[-1]
+            if self.__step is None:
+                self.__step = step
+            elif step != self.__step:
+                self.__regular = False
+            if step <= 0:
+                self.__sorted = False
+        try:
+            self.__epochs.append(epoch)
+        except BufferError:
+            self.__detach()
+            self.__epochs.append(epoch)
+        try:
+            self.__values.append(value)
+        except BufferError:
+            self.__detach()
+            self.__values.append(value)
+
+    def __detach(self) -> None:
+        """@private
+        Copies the columns, since arrays that are shared with slices (or numpy arrays)
+        can't grow. The slices keep the old columns.
+        """
+        epochs, values = array("q"), array("d")
+        epochs.frombytes(memoryview(self.__epochs).cast("B"))
+        values.frombytes(memoryview(self.__values).cast("B"))
+        self.__epochs, self.__values = epochs, values
 
     def to_csv(self, filename: str, sep: str = ";") -> None:
         """@public
-        Exports the result to a csv file. Row oriented.
+        Exports the result to a csv file. Row oriented, written in batches.
 
         >>> result = savings.run("2024-1-1", "2024-3-1")
         >>> result.to_csv("test.csv")
         """
-        f = open(filename, "w")
-        for date, value in zip(self.schedule, self.values):
-            f.write(str(date) + sep + str(value) + "\n")
+        with open(filename, "w") as f:
+            for begin in range(0, len(self), BATCH_SIZE):
+                batch = self.__view_of(begin, begin + BATCH_SIZE)
+                rows = zip(batch.schedule, batch.values)
+                f.write("".join([str(d) + sep + str(value) + "\n" for d, value in rows]))
+
+    @classmethod
+    def from_csv(cls, filename: str, sep: str = ";") -> Any:
+        """@public
+        Loads a result from a csv file in the format of Result.to_csv().
+
+        >>> result = Result.from_csv("test.csv")
+        """
+        epochs, values = array("q"), array("d")
+        with open(filename) as f:
+            while lines := f.readlines(1 << 20):
+                rows = [line.rstrip("\n").split(sep) for line in lines if line.strip()]
+                dates = [date for date, _ in rows]
+                if np is not None:
+                    dates = np.array(dates, dtype="datetime64[us]").astype(np.int64)
+                    epochs.frombytes(dates.tobytes())
+                else:
+                    epochs.extend([to_epoch(datetime.fromisoformat(d)) for d in dates])
+                values.extend([float(value) for _, value in rows])
+        return cls.from_arrays(epochs, values)
+
+    def save(self, filename: str) -> None:
+        """@public
+        Saves the result to a binary file with a column of dates (epoch microseconds,
+        int64) and a column of values (float64), after a 64 byte header. Much faster to
+        write and read than csv, and can be memory-mapped by Result.load().
+
+        >>> result.save("test.res")
+        """
+        header = pack(
+            FILE_HEADER,
+            FILE_MAGIC,
+            len(self),
+            self.__step or 0,
+            self.__regular,
+            self.__sorted,
+        )
+        with open(filename, "wb") as f:
+            f.write(header.ljust(FILE_HEADER_SIZE, b"\0"))
+            f.write(little_endian(self.__epochs))
+            f.write(little_endian(self.__values))
+
+    @classmethod
+    def load(cls, filename: str, mapped: bool = False) -> Any:
+        """@public
+        Loads a result saved by Result.save(). If mapped is set, the file is
+        memory-mapped instead of read: the result is a read-only view on the file, pages
+        are only read when they are used, so results larger than memory can be opened.
+
+        >>> result = Result.load("test.res")
+        >>> result = Result.load("archive.res", mapped=True)
+        >>> result["2030-1-1":"2031-1-1"].resample(Granularity.month)
+        """
+        with open(filename, "rb") as f:
+            header = f.read(FILE_HEADER_SIZE)
+            if header[: len(FILE_MAGIC)] != FILE_MAGIC:
+                raise Exception("File " + str(filename) + " is not a result file.")
+            _, rows, step, regular, ordered = unpack(
+                FILE_HEADER, header[: calcsize(FILE_HEADER)]
+            )
+            result = cls()
+            if mapped and sys.byteorder == "little":
+                buffer = memoryview(mmap(f.fileno(), 0, access=ACCESS_READ))
+                middle = FILE_HEADER_SIZE + 8 * rows
+                result.__epochs = buffer[FILE_HEADER_SIZE:middle].cast("q")
+                result.__values = buffer[middle : middle + 8 * rows].cast("d")
+                result.__view = True
+            else:
+                result.__epochs.fromfile(f, rows)
+                result.__values.fromfile(f, rows)
+                result.__epochs = little_endian(result.__epochs)
+                result.__values = little_endian(result.__values)
+        result.__step = step if rows > 1 else None
+        result.__regular = bool(regular)
+        result.__sorted = bool(ordered)
+        return result
@@ -1,10 +1,16 @@
+from array import array
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any
+from threading import Lock
+from typing import Any, Callable, Iterator
 
-from cron_converter import Cron
 from dateutil.relativedelta import relativedelta
 
+from pylan.cron import compile_cron
+
 DATE_FORMAT = "%Y-%m-%d"
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
 
 
 def keep_or_convert(date: str | datetime) -> datetime:
@@ -14,6 +20,20 @@ def keep_or_convert(date: str | datetime) -> datetime:
     return datetime.strptime(date, DATE_FORMAT) if isinstance(date, str) else date
 
 
+def to_epoch(date: datetime) -> int:
+    """@private
+    Returns the date as microseconds since 1970-1-1.
+    """
+    return (date - EPOCH) // MICROSECOND
+
+
+def from_epoch(epoch: int) -> datetime:
+    """@private
+    Returns the datetime of an epoch in microseconds.
+    """
+    return EPOCH + timedelta(microseconds=epoch)
+
+
 def valid_dt(date: str | datetime) -> bool:
     """@private
     Returns true if string or datetime is valid datetime.
@@ -27,25 +47,24 @@ def valid_dt(date: str | datetime) -> bool:
 
 def valid_cron(cron_schedule: str) -> bool:
     """@private
-    Returns true if string is a valid cron
+    Returns true if string is a valid cron. Interval strings like 1m are rejected without
+    parsing since they don't have 5 fields.
     """
+    if not isinstance(cron_schedule, str) or len(cron_schedule.split()) != 5:
+        return False
     try:
-        Cron(cron_schedule)
+        compile_cron(cron_schedule)
         return True
-    except (ValueError, AttributeError, TypeError):
+    except ValueError:
         return False
 
 
-def cron_schedule(cron_schedule, start: datetime, end: datetime) -> list[datetime]:
+def cron_schedule(cron_schedule, start: datetime, end: datetime) -> Iterator[datetime]:
     """@private
-    Iterates through cron schedule between a start and end date.
+    Iterates through cron schedule between a start and end date (unbounded if the end
+    date is None).
     """
-    cron = Cron(cron_schedule)
-    schedule = cron.schedule(start)
-    dt_schedule = []
-    while schedule.next() < end:
-        dt_schedule.append(schedule.date)
-    return dt_schedule
+    return compile_cron(cron_schedule).occurrences(start, end)
 
 
 def timedelta_from_str(interval: str) -> timedelta:
@@ -72,61 +91,225 @@ def timedelta_from_str(interval: str) -> timedelta:
 
 def interval_schedule(
     start: datetime, end: datetime, interval: str, include_start: bool
-) -> list[datetime]:
+) -> Iterator[datetime]:
     """@private
-    Based on the timedelta from string, return a list of datetime objects between start
-    and end.
+    Based on the timedelta from string, yield datetime objects between start and end
+    (unbounded if the end date is None).
     """
-    dt_schedule = []
     interval = timedelta_from_str(interval)
     if include_start:
-        dt_schedule.append(start)
-    while start <= end:
+        yield start
+    while end is None or start <= end:
         start += interval
-        dt_schedule.append(start)
-        if start >= end:
+        yield start
+        if end is not None and start >= end:
             break
-    return dt_schedule
 
 
 def alt_interval_schedule(
     start: datetime, end: datetime, interval: list[str], include_start: bool
-) -> list[datetime]:
+) -> Iterator[datetime]:
     """@private
-    Based on a list with objects that have a timedelta from string, return a list of
-    datetime objects between start and end.
+    Based on a list with objects that have a timedelta from string, yield datetime
+    objects between start and end (unbounded if the end date is None).
     """
+    intervals = [timedelta_from_str(i) for i in interval]
     interval_index = 0
-    dt_schedule = []
     if include_start:
-        dt_schedule.append(start)
-    while start <= end:
-        start += timedelta_from_str(interval[interval_index])
-        dt_schedule.append(start)
+        yield start
+    while end is None or start <= end:
+        start += intervals[interval_index]
+        yield start
         interval_index += 1
-        if interval_index >= len(interval):
+        if interval_index >= len(intervals):
             interval_index = 0
-        if start >= end:
+        if end is not None and start >= end:
             break
-    return dt_schedule
 
 
-def timedelta_from_schedule(
+class ScheduleCache:
+    """@public
+    Process wide LRU cache of expanded schedules, shared by all projections, items and
+    runs. Schedules between a start and end date are expanded once and stored as compact
+    arrays of epoch microseconds (8 bytes per date), keyed on the schedule, start, end
+    and include_start (offsets are part of the start date). The first expansion is
+    streamed and only stored once it is used up. The cache is bounded by the total
+    number of stored dates (100000 by default, under 1 MB); unbounded schedules are never
+    cached. A size of 0 turns the cache off.
+
+    >>> from pylan.schedule import schedule_cache
+    >>> schedule_cache.stats # hits, misses, evictions, entries and dates
+    >>> schedule_cache.resize(100000)
+    >>> schedule_cache.clear()
+    """
+
+    def __init__(self, max_dates: int = 100000) -> None:
+        self.max_dates = max_dates
+        self.entries = OrderedDict()
+        self.dates = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+    @property
+    def stats(self) -> dict:
+        """@public
+        Returns the hit, miss and eviction counts and the current size of the cache.
+
+        >>> schedule_cache.stats["hits"]
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "dates": self.dates,
+        }
+
+    def clear(self) -> None:
+        """@public
+        Removes all schedules from the cache and resets the statistics.
+
+        >>> schedule_cache.clear()
+        """
+        with self.lock:
+            self.entries.clear()
+            self.dates = self.hits = self.misses = self.evictions = 0
+
+    def resize(self, max_dates: int) -> None:
+        """@public
+        Sets the maximum number of dates kept in the cache, evicting the least recently
+        used schedules if needed.
+
+        >>> schedule_cache.resize(100000)
+        """
+        with self.lock:
+            self.max_dates = max_dates
+            self.__evict()
+
+    def get(self, key: tuple, expand: Callable) -> Iterator[datetime]:
+        """@private
+        Returns an iterator over the cached schedule for the key, or over the expanded
+        schedule, which is stored once it is used up.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return map(from_epoch, self.entries[key])
+            self.misses += 1
+        return self.__store(key, expand())
+
+    def __store(self, key: tuple, dates: Iterator[datetime]) -> Iterator[datetime]:
+        """@private
+        Yields the dates of a schedule while they are expanded and collects them as
+        epochs. Runs stop pulling dates once they are past the end of the run, so the
+        schedule is stored as soon as a date at or past the end date is expanded, and the
+        (few) dates after it are expanded right away. Schedules with more dates than fit
+        in the cache (or timezone aware dates) are not collected.
+        """
+        epochs = array("q")
+        end = key[2]
+        for date in dates:
+            epochs = self.__collect(epochs, date)
+            if epochs is not None and date >= end:
+                rest = list(dates)
+                for later in rest:
+                    epochs = self.__collect(epochs, later)
+                self.__save(key, epochs)
+                yield date
+                yield from rest
+                return
+            yield date
+        self.__save(key, epochs)
+
+    def __collect(self, epochs: array, date: datetime) -> array:
+        """@private
+        Adds a date to the collected epochs, or returns None if the schedule can't be
+        cached.
+        """
+        if epochs is None or len(epochs) >= self.max_dates or date.tzinfo is not None:
+            return None
+        epochs.append(to_epoch(date))
+        return epochs
+
+    def __save(self, key: tuple, epochs: array) -> None:
+        """@private
+        Stores the collected epochs of a schedule, unless it couldn't be cached.
+        """
+        with self.lock:
+            if epochs is not None and key not in self.entries:
+                self.entries[key] = epochs
+                self.dates += len(epochs)
+                self.__evict()
+
+    def __evict(self) -> None:
+        """@private
+        Drops the least recently used schedules until the cache fits.
+        """
+        while self.dates > self.max_dates:
+            _, dates = self.entries.popitem(last=False)
+            self.dates -= len(dates)
+            self.evictions += 1
+
+
+schedule_cache = ScheduleCache()
+
+
+def iter_schedule(
     schedule: Any,
     start: datetime = None,
     end: datetime = None,
     include_start: bool = False,
-) -> list[datetime]:
+) -> Iterator[datetime]:
     """@private
-    Entrypoint of this submodule. Takes a string with some datetime objects and returns
-    a list of datetime objects that represent the schedule.
+    Streaming entrypoint of this submodule. Takes a string with some datetime objects and
+    yields the datetime objects that represent the schedule, one occurrence at a time.
+    Without an end date, interval and cron schedules never stop. Bounded schedules go
+    through the schedule cache.
+    """
+    if end is None or not schedule_cache.max_dates:
+        return stream_schedule(schedule, start, end, include_start)
+    key = (
+        tuple(schedule) if isinstance(schedule, list) else schedule,
+        start,
+        end,
+        include_start,
+    )
+    return schedule_cache.get(
+        key, lambda: stream_schedule(schedule, start, end, include_start)
+    )
+
+
+def stream_schedule(
+    schedule: Any,
+    start: datetime = None,
+    end: datetime = None,
+    include_start: bool = False,
+) -> Iterator[datetime]:
+    """@private
+    Yields the scheduled datetimes by dispatching on the schedule format.
     """
     if valid_cron(schedule):
         return cron_schedule(schedule, start, end)
     elif isinstance(schedule, str):
         return interval_schedule(start, end, schedule, include_start)
     elif isinstance(schedule, list) and all(valid_dt(i) for i in schedule):
-        return [keep_or_convert(i) for i in schedule]
+        return (keep_or_convert(i) for i in schedule)
     elif isinstance(schedule, list) and all(isinstance(i, str) for i in schedule):
         return alt_interval_schedule(start, end, schedule, include_start)
     raise Exception("Schedule format " + str(schedule) + " invalid.")
+
+
+def timedelta_from_schedule(
+    schedule: Any,
+    start: datetime = None,
+    end: datetime = None,
+    include_start: bool = False,
+) -> list[datetime]:
+    """@private
+    Entrypoint of this submodule. Takes a string with some datetime objects and returns
+    a list of datetime objects that represent the schedule.
+    """
+    return list(iter_schedule(schedule, start, end, include_start))
@@ -0,0 +1,163 @@
+from itertools import groupby
+from operator import itemgetter
+from typing import Any
+
+from pylan.context import apply_operation
+from pylan.engine import grid_epochs, nested_events, projection_events
+from pylan.grid import Grid
+from pylan.result import Result
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class Simulation:
+    """@public
+    Outputted by Item.simulate(). Holds the values of all paths on the dates of the run.
+    The values are only stored for the dates where projections are applied, so memory
+    grows with the number of events times the number of paths, not with the granularity.
+    Percentiles, means and other statistics are computed over the paths for every date.
+
+    >>> simulation = savings.simulate(10000, "2024-1-1", "2054-1-1", seed=42)
+    >>> simulation.percentile(50) # median path as a result
+    >>> bands = simulation.bands() # {5: Result, 25: Result, ...}
+    >>> simulation.summary() # statistics of the final values
+    >>> simulation.paths # 2-D numpy array (dates x paths)
+    """
+
+    def __init__(self, epochs: Any, rows: Any, row_index: Any) -> None:
+        self.n_paths = rows.shape[1]
+        self.__epochs = epochs
+        self.__rows = rows
+        self.__row_index = row_index
+
+    def __len__(self) -> int:
+        return len(self.__row_index)
+
+    def __result(self, values: Any) -> Result:
+        """@private
+        Spreads values per row over the dates of the run and returns them as a result.
+        """
+        return Result.from_arrays(self.__epochs, values[self.__row_index])
+
+    @property
+    def paths(self) -> Any:
+        """@public
+        Returns the values of all paths as a 2-D numpy array, with a row per date and a
+        column per path. Note, this array can be large for small granularities.
+
+        >>> simulation.paths[:, 0] # first path
+        """
+        return self.__rows[self.__row_index]
+
+    @property
+    def final(self) -> Any:
+        """@public
+        Returns the values of all paths on the last date as a numpy array.
+
+        >>> (simulation.final < 0).mean() # probability of ending below zero
+        """
+        return self.__rows[self.__row_index[-1]]
+
+    @property
+    def mean(self) -> Result:
+        """@public
+        Returns the mean over all paths as a result.
+
+        >>> simulation.mean.final
+        """
+        return self.__result(self.__rows.mean(axis=1))
+
+    def percentile(self, q: float) -> Result:
+        """@public
+        Returns the q-th percentile over all paths (between 0 and 100) as a result.
+
+        >>> simulation.percentile(5)["2040-1-1"]
+        """
+        return self.__result(np.percentile(self.__rows, q, axis=1))
+
+    def bands(self, percentiles: tuple[float] = PERCENTILES) -> dict[float, Result]:
+        """@public
+        Returns a dict with a result for every percentile, computed in a single pass.
+
+        >>> bands = simulation.bands((10, 50, 90))
+        >>> x, y = bands[90].plot_axes()
+        """
+        values = np.percentile(self.__rows, percentiles, axis=1)
+        return {q: self.__result(band) for q, band in zip(percentiles, values)}
+
+    def summary(self, percentiles: tuple[float] = PERCENTILES) -> dict[str, float]:
+        """@public
+        Returns statistics of the final values: mean, std, min, max and percentiles (with
+        keys p5, p25, etc).
+
+        >>> simulation.summary()["p50"]
+        """
+        final = self.final
+        summary = {
+            "mean": final.mean().item(),
+            "std": final.std().item(),
+            "min": final.min().item(),
+            "max": final.max().item(),
+        }
+        for q, value in zip(percentiles, np.percentile(final, percentiles)):
+            summary["p" + str(q)] = value.item()
+        return summary
+
+
+def run_paths(context: Any, grid: Grid, n_paths: int, seed: int = None) -> Simulation:
+    """@private
+    Runs all paths of a simulation at once. The events are visited in the same order as
+    Item.run(), and every event updates an array with a value per path. Distributions
+    without a seed draw from a generator with the seed of the simulation.
+    """
+    if np is None:
+        raise Exception("Item.simulate() requires numpy (pip install numpy).")
+    states = context.states
+    rng = np.random.default_rng(seed)
+    generators = {}
+    for state in states + [nested for parent in states for nested in parent.projections]:
+        if state.operation is None:
+            raise Exception(type(state.projection).__name__ + " can't be simulated.")
+        distribution = state.projection.distribution
+        if distribution is not None and distribution.seed is not None:
+            generators[id(distribution)] = np.random.default_rng(distribution.seed)
+        if distribution is not None and state.projections:
+            raise Exception(
+                "Projections with a distribution can't have nested projections."
+            )
+
+    def draw(state: Any, value: Any) -> Any:
+        distribution = state.projection.distribution
+        if distribution is None:
+            return value
+        return distribution.sample(generators.get(id(distribution), rng), n_paths)
+
+    nested = [nested_events(state, grid) for state in states]
+    positions = [0] * len(states)
+    current = [state.value for state in states]
+    events = [
+        (tick, [index for _, index in group])
+        for tick, group in groupby(projection_events(states, grid), itemgetter(0))
+    ]
+    rows = np.empty((len(events) + 1, n_paths), dtype=float)
+    rows[0] = values = np.full(n_paths, context.value, dtype=float)
+    for row, (tick, indices) in enumerate(events, 1):
+        for index in indices:
+            position = positions[index]
+            while position < len(nested[index]) and nested[index][position][0] <= tick:
+                child = nested[index][position][1]
+                operand = draw(child, child.value)
+                current[index] = apply_operation(child.operation, current[index], operand)
+                position += 1
+            positions[index] = position
+            operand = draw(states[index], current[index])
+            values = apply_operation(states[index].operation, values, operand)
+        rows[row] = values
+    ticks = [tick for tick, _ in events]
+    row_index = np.searchsorted(ticks, np.arange(len(grid)), side="right")
+    return Simulation(grid_epochs(grid), rows, row_index)
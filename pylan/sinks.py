@@ -0,0 +1,300 @@
+from abc import ABC, abstractmethod
+from array import array
+from datetime import datetime
+from mmap import mmap
+from struct import pack
+from typing import Any, Callable
+
+from pylan.result import (
+    FILE_HEADER,
+    FILE_HEADER_SIZE,
+    FILE_MAGIC,
+    Result,
+    little_endian,
+)
+from pylan.schedule import to_epoch
+
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPY_HEADER_SIZE = 128
+
+
+class Sink(ABC):
+    """@public
+    Sink is an abstract base class that receives the rows of Item.run() in batches, so the
+    full result never has to be kept in memory. Implementations:
+    - CsvSink(filename, sep=";")
+    - NpySink(filename)
+    - CallbackSink(callback)
+    - MappedSink(filename)
+
+    All implementations have an optional batch_size parameter (number of rows buffered
+    before they are written). Item.run() closes the sink and returns it.
+
+    >>> sink = savings.run("2024-1-1", "2054-1-1", sink=CsvSink("run.csv"))
+    >>> sink.rows
+    """
+
+    def __init__(self, batch_size: int = 10000) -> None:
+        self.batch_size = batch_size
+        self.rows = 0
+        self.closed = False
+        self.dates = []
+        self.values = []
+
+    def __enter__(self) -> Any:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @abstractmethod
+    def write(self, dates: list[datetime], values: list[float]) -> None:
+        """@public
+        Writes a batch of rows. Implemented in the specific classes.
+        """
+
+    def add_result(self, date: datetime, value: float) -> None:
+        """@private
+        Buffers a row, and writes the buffer once it is full. Values are stored as floats,
+        the same as in a result.
+        """
+        self.dates.append(date)
+        self.values.append(float(value))
+        if len(self.dates) >= self.batch_size:
+            self.flush()
+
+    def add_results(self, dates: list[datetime], values: list[float]) -> None:
+        """@private
+        Buffers a list of rows, and writes the buffer once it is full.
+        """
+        self.dates.extend(dates)
+        self.values.extend(values)
+        if len(self.dates) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """@public
+        Writes the buffered rows.
+        """
+        if self.dates:
+            self.write(self.dates, self.values)
+            self.rows += len(self.dates)
+            self.dates = []
+            self.values = []
+
+    def close(self) -> None:
+        """@public
+        Writes the remaining rows and closes the sink.
+        """
+        if not self.closed:
+            self.flush()
+            self.closed = True
+
+
+class CsvSink(Sink):
+    """@public
+    Writes the rows to a csv file, in the same format as Result.to_csv().
+
+    >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, sink=CsvSink("run.csv"))
+    """
+
+    def __init__(self, filename: str, sep: str = ";", batch_size: int = 10000) -> None:
+        super().__init__(batch_size)
+        self.sep = sep
+        self.file = open(filename, "w")
+
+    def write(self, dates: list[datetime], values: list[float]) -> None:
+        """@private
+        Writes a batch of rows to the file with a single call.
+        """
+        sep = self.sep
+        rows = [str(date) + sep + str(value) + "\n" for date, value in zip(dates, values)]
+        self.file.write("".join(rows))
+
+    def close(self) -> None:
+        """@private
+        Writes the remaining rows and closes the file.
+        """
+        if not self.closed:
+            super().close()
+            self.file.close()
+
+
+class NpySink(Sink):
+    """@public
+    Writes the rows to a binary .npy file with a structured array (date: datetime64[us],
+    value: float64). Doesn't require numpy to write, the file can be read with np.load().
+
+    >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, sink=NpySink("run.npy"))
+    >>> np.load("run.npy")["value"]
+    """
+
+    def __init__(self, filename: str, batch_size: int = 10000) -> None:
+        super().__init__(batch_size)
+        self.file = open(filename, "wb")
+        self.file.write(self.__header(0))
+
+    def __header(self, rows: int) -> bytes:
+        """@private
+        Returns the npy header, padded to a fixed size so it can be rewritten on close.
+        """
+        header = (
+            "{'descr': [('date', '<M8[us]'), ('value', '<f8')], "
+            "'fortran_order': False, 'shape': (" + str(rows) + ",), }"
+        )
+        header = header.ljust(NPY_HEADER_SIZE - len(NPY_MAGIC) - 3) + "\n"
+        return NPY_MAGIC + pack("<H", len(header)) + header.encode("latin1")
+
+    def write(self, dates: list[datetime], values: list[float]) -> None:
+        """@private
+        Writes a batch of (date, value) records to the file.
+        """
+        records = []
+        for date, value in zip(dates, values):
+            records.append(to_epoch(date))
+            records.append(value)
+        self.file.write(pack("<" + "qd" * len(dates), *records))
+
+    def close(self) -> None:
+        """@private
+        Writes the remaining rows, sets the number of rows in the header and closes the
+        file.
+        """
+        if not self.closed:
+            super().close()
+            self.file.seek(0)
+            self.file.write(self.__header(self.rows))
+            self.file.close()
+
+
+class CallbackSink(Sink):
+    """@public
+    Passes every batch of rows to a callback with the dates and values as parameters.
+
+    >>> sink = CallbackSink(lambda dates, values: print(len(dates)), batch_size=1000)
+    >>> savings.run("2024-1-1", "2054-1-1", Granularity.hour, sink=sink)
+    """
+
+    def __init__(
+        self, callback: Callable[[list, list], None], batch_size: int = 10000
+    ) -> None:
+        super().__init__(batch_size)
+        self.callback = callback
+
+    def write(self, dates: list[datetime], values: list[float]) -> None:
+        """@private
+        Calls the callback with the batch.
+        """
+        self.callback(dates, values)
+
+
+class MappedSink(Sink):
+    """@public
+    Writes the rows to a result file (see Result.save()) through a memory map that grows
+    in chunks, so runs that don't fit in memory are kept on disk. The closed sink has the
+    rows as a result that is memory-mapped from the file. Item.run() uses this sink when
+    a filename is passed as mapped.
+
+    >>> sink = MappedSink("run.res")
+    >>> savings.run("2024-1-1", "2124-1-1", Granularity.hour, sink=sink)
+    >>> sink.result.final
+    """
+
+    def __init__(
+        self, filename: str, chunk_size: int = 1 << 20, batch_size: int = 10000
+    ) -> None:
+        super().__init__(batch_size)
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.capacity = 0
+        self.last = None
+        self.step = None
+        self.regular = True
+        self.sorted = True
+        self.file = open(filename, "w+b")
+        self.file.truncate(FILE_HEADER_SIZE + 16 * chunk_size)
+        self.map = mmap(self.file.fileno(), FILE_HEADER_SIZE + 16 * chunk_size)
+        self.capacity = chunk_size
+
+    def __grow(self, rows: int) -> None:
+        """@private
+        Grows the file by chunks (at least doubling it) until it holds the rows, and moves
+        the values after the larger date column.
+        """
+        capacity = self.capacity
+        while capacity < rows:
+            capacity += max(self.chunk_size, capacity)
+        self.map.resize(FILE_HEADER_SIZE + 16 * capacity)
+        self.map.move(
+            FILE_HEADER_SIZE + 8 * capacity,
+            FILE_HEADER_SIZE + 8 * self.capacity,
+            8 * self.rows,
+        )
+        self.capacity = capacity
+
+    def __check_grid(self, epochs: array) -> None:
+        """@private
+        Keeps track of the step size and order of the dates, the same as a result.
+        """
+        previous = self.last
+        for epoch in epochs:
+            if previous is not None:
+                step = epoch - previous
+                if self.step is None:
+                    self.step = step
+                elif step != self.step:
+                    self.regular = False
+                if step <= 0:
+                    self.sorted = False
+            previous = epoch
+        self.last = previous
+
+    def write(self, dates: list[datetime], values: list[float]) -> None:
+        """@private
+        Copies a batch of rows into the columns of the file.
+        """
+        epochs = array("q", [to_epoch(date) for date in dates])
+        self.__check_grid(epochs)
+        if self.rows + len(epochs) > self.capacity:
+            self.__grow(self.rows + len(epochs))
+        begin = FILE_HEADER_SIZE + 8 * self.rows
+        self.map[begin : begin + 8 * len(epochs)] = little_endian(epochs)
+        begin += 8 * self.capacity
+        self.map[begin : begin + 8 * len(epochs)] = little_endian(array("d", values))
+
+    def close(self) -> None:
+        """@private
+        Writes the remaining rows, moves the values right after the dates, writes the
+        header and truncates the file to its rows.
+        """
+        if not self.closed:
+            super().close()
+            header = pack(
+                FILE_HEADER,
+                FILE_MAGIC,
+                self.rows,
+                self.step or 0,
+                self.regular,
+                self.sorted,
+            )
+            self.map.move(
+                FILE_HEADER_SIZE + 8 * self.rows,
+                FILE_HEADER_SIZE + 8 * self.capacity,
+                8 * self.rows,
+            )
+            self.map[:FILE_HEADER_SIZE] = header.ljust(FILE_HEADER_SIZE, b"\0")
+            self.map.flush()
+            self.map.close()
+            self.file.truncate(FILE_HEADER_SIZE + 16 * self.rows)
+            self.file.close()
+
+    @property
+    def result(self) -> Result:
+        """@public
+        Returns the rows as a read-only result that is memory-mapped from the file.
+
+        >>> sink.result["2100-1-1"]
+        """
+        if not self.closed:
+            raise Exception("Can't read the result before the sink is closed.")
+        return Result.load(self.filename, mapped=True)
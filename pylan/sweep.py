@@ -0,0 +1,162 @@
+import os
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import product
+from typing import Any, Iterator
+
+from pylan.plan import Plan, run_program
+from pylan.result import Result
+
+PROGRAM = None
+
+
+class Sweep:
+    """@public
+    Outputted by Item.sweep(). Holds a result for every combination of parameter values,
+    all on the same dates. Results can be looked up with a tuple of values (in the order
+    of the parameters) or a dict with the parameter names.
+
+    >>> sweep = savings.sweep({"growth": (growth, [1.02, 1.05]), "rent": (rent, [900])})
+    >>> sweep[1.05, 900].final
+    >>> sweep[{"growth": 1.02, "rent": 900}]
+    >>> for parameters, result in sweep:
+    >>>     print(parameters, result.final)
+    >>> sweep.to_csv("sweep.csv") # row per combination, column per date
+    """
+
+    def __init__(
+        self, names: list[str], combinations: list[tuple], results: list[Result]
+    ) -> None:
+        self.names = names
+        self.combinations = combinations
+        self.results = results
+        self.__index = {combination: i for i, combination in enumerate(combinations)}
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def __iter__(self) -> Iterator[tuple[dict, Result]]:
+        """@public
+        Iterates over the (parameters, result) pairs, where parameters is a dict with the
+        value of every parameter.
+
+        >>> for parameters, result in sweep:
+        >>>     print(parameters["growth"], result.final)
+        """
+        for combination, result in zip(self.combinations, self.results):
+            yield dict(zip(self.names, combination)), result
+
+    def __getitem__(self, key: tuple | dict) -> Result:
+        """@public
+        Returns the result of a combination of parameter values.
+
+        >>> sweep[1.05, 900]
+        """
+        if isinstance(key, dict):
+            key = tuple(key[name] for name in self.names)
+        elif not isinstance(key, tuple):
+            key = (key,)
+        if key not in self.__index:
+            raise Exception("Combination " + str(key) + " not found in sweep.")
+        return self.results[self.__index[key]]
+
+    @property
+    def schedule(self) -> list[datetime]:
+        """@public
+        Returns the dates that all results share.
+        """
+        return self.results[0].schedule if self.results else []
+
+    def table(self) -> list[list]:
+        """@public
+        Returns the sweep as a table, with the parameter names and dates as header and a
+        row with the parameter values and result values for every combination.
+
+        >>> header, *rows = sweep.table()
+        """
+        rows = [self.names + self.schedule]
+        for combination, result in zip(self.combinations, self.results):
+            rows.append(list(combination) + result.values)
+        return rows
+
+    def to_csv(self, filename: str, sep: str = ";") -> None:
+        """@public
+        Exports the table of the sweep to a csv file.
+
+        >>> sweep.to_csv("sweep.csv")
+        """
+        with open(filename, "w") as f:
+            for row in self.table():
+                f.write(sep.join(str(cell) for cell in row) + "\n")
+
+
+def share_program(program: list[list[tuple]]) -> None:
+    """@private
+    Initializer of the worker processes, the program is sent once per worker instead of
+    once per combination.
+    """
+    global PROGRAM
+    PROGRAM = program
+
+
+def run_chunk(chunk: list[list[float]], program: list[list[tuple]] = None) -> list[array]:
+    """@private
+    Runs a program for a chunk of slots. Worker processes use the shared program.
+    """
+    program = PROGRAM if program is None else program
+    return [run_program(program, slots) for slots in chunk]
+
+
+def free_threaded() -> bool:
+    """@private
+    Returns true if Python runs without the global interpreter lock.
+    """
+    return hasattr(sys, "_is_gil_enabled") and not sys._is_gil_enabled()
+
+
+def run_sweep(
+    plan: Plan,
+    parameters: dict[str, tuple[Any, list]],
+    workers: int = None,
+    executor: str = None,
+) -> Sweep:
+    """@private
+    Runs every combination of parameter values on a compiled plan. The combinations are
+    split in chunks over a process pool (or a thread pool on free threaded Python), which
+    receives the steps of the plan once per worker. Workers only return the values after
+    every tick with events, which are spread over the ticks of the plan afterwards.
+    """
+    targets = [plan.slot(projection) for projection, _ in parameters.values()]
+    combinations = list(product(*[values for _, values in parameters.values()]))
+    combination_slots = [
+        plan.initial(values=dict(zip(targets, combination)))
+        for combination in combinations
+    ]
+
+    workers = workers or os.cpu_count() or 1
+    executor = executor or ("thread" if free_threaded() else "process")
+    if executor not in ["process", "thread"]:
+        raise Exception("Executor " + str(executor) + " is not process or thread.")
+    steps = plan.steps
+    if workers == 1 or len(combinations) < 2:
+        values = run_chunk(combination_slots, steps)
+    else:
+        size = max(1, len(combinations) // (workers * 4))
+        chunks = [
+            combination_slots[begin : begin + size]
+            for begin in range(0, len(combinations), size)
+        ]
+        if executor == "process":
+            pool = ProcessPoolExecutor(workers, None, share_program, (steps,))
+            run = run_chunk
+        else:
+            pool = ThreadPoolExecutor(workers)
+            run = partial(run_chunk, program=steps)
+        with pool:
+            values = [values for chunk in pool.map(run, chunks) for values in chunk]
+
+    results = [Result.from_arrays(plan.epochs, plan.spread(rows)) for rows in values]
+    return Sweep(list(parameters), combinations, results)
@@ -0,0 +1,132 @@
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any
+
+from pylan.engine import scheduled_events
+from pylan.grid import Grid
+from pylan.schedule import keep_or_convert
+
+IDENTITY = (1, 0)
+
+
+def affine(operation: str, value: float) -> tuple[float, float]:
+    """@private
+    Returns the projection operation as an affine map (a, b), so that v -> a * v + b.
+    """
+    if operation == "add":
+        return 1, value
+    elif operation == "subtract":
+        return 1, -value
+    elif operation == "multiply":
+        return value, 0
+    elif operation == "divide":
+        return 1 / value, 0
+    elif operation == "replace":
+        return 0, value
+    raise Exception("Operation " + str(operation) + " can't be compiled to a timeline.")
+
+
+def compose(first: tuple[float, float], second: tuple[float, float]) -> tuple[float, float]:
+    """@private
+    Returns the affine map that applies the first map and then the second map.
+    """
+    return second[0] * first[0], second[0] * first[1] + second[1]
+
+
+class Timeline:
+    """@public
+    Compiled version of a run, created with Item.timeline(). Every projection is an affine
+    map (v -> a * v + b), and the maps of all scheduled events are composed in a segment
+    tree. Values at arbitrary dates are answered in logarithmic time without running the
+    simulation again.
+
+    >>> timeline = savings.timeline("2024-1-1", "2054-1-1")
+    >>> timeline.value_at("2040-5-5")
+    >>> timeline.value_at("2040-5-5", start_value=5000) # different start value
+    >>> timeline.delta_between("2030-1-1", "2031-1-1")
+    """
+
+    def __init__(self, context: Any, grid: Grid) -> None:
+        self.grid = grid
+        self.start_value = context.value
+        self.ticks = []
+        self.values = []
+        maps = []
+        for tick, state in scheduled_events(context.states, grid):
+            if state.operation is None:
+                name = type(state.projection).__name__
+                raise Exception(name + " has no affine operation.")
+            state.apply(context)
+            self.ticks.append(tick)
+            self.values.append(context.value)
+            maps.append(affine(state.operation, state.value))
+        self.size = 1
+        while self.size < len(maps):
+            self.size *= 2
+        self.tree = [IDENTITY] * (2 * self.size)
+        self.tree[self.size : self.size + len(maps)] = maps
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = compose(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def __event_index(self, date: str | datetime) -> int:
+        """@private
+        Returns the index of the last event on or before the date (-1 if there is none).
+        """
+        date = keep_or_convert(date)
+        if date < self.grid.start or date > self.grid.end:
+            raise Exception("Date " + str(date) + " is outside of the timeline.")
+        tick = self.grid.above(date) - 1
+        return bisect_right(self.ticks, tick) - 1
+
+    def __compose_range(self, left: int, right: int) -> tuple[float, float]:
+        """@private
+        Composes the maps of the events with index left up to (not including) right.
+        """
+        first, second = IDENTITY, IDENTITY
+        left += self.size
+        right += self.size
+        while left < right:
+            if left & 1:
+                first = compose(first, self.tree[left])
+                left += 1
+            if right & 1:
+                right -= 1
+                second = compose(self.tree[right], second)
+            left //= 2
+            right //= 2
+        return compose(first, second)
+
+    def value_at(self, date: str | datetime, start_value: float = None) -> float:
+        """@public
+        Returns the value on a date. Without a start value, this is the value that
+        Item.run() would return for that date. With a start value, the composed map is
+        applied to it instead.
+
+        >>> timeline.value_at("2040-5-5")
+        """
+        index = self.__event_index(date)
+        if start_value is None:
+            return self.values[index] if index >= 0 else self.start_value
+        a, b = self.__compose_range(0, index + 1)
+        return a * start_value + b
+
+    def affine_between(
+        self, start: str | datetime, end: str | datetime
+    ) -> tuple[float, float]:
+        """@public
+        Returns the affine map (a, b) of all events after start up to and including end.
+        So the value on the end date is a * value + b, given the value on the start date.
+
+        >>> a, b = timeline.affine_between("2030-1-1", "2031-1-1")
+        """
+        return self.__compose_range(
+            self.__event_index(start) + 1, self.__event_index(end) + 1
+        )
+
+    def delta_between(self, start: str | datetime, end: str | datetime) -> float:
+        """@public
+        Returns the change in value between the start and end date.
+
+        >>> timeline.delta_between("2030-1-1", "2031-1-1")
+        """
+        return self.value_at(end) - self.value_at(start)
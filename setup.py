@@ -36,5 +36,6 @@ setup(
     license="BSD",
     packages=find_packages(exclude=[".github"]),
     install_requires=read_requirements("requirements.txt"),
+    extras_require={"numpy": ["numpy"]},
     keywords=["timeseries", "simulation", "planning"],
 )
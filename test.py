@@ -1,10 +1,50 @@
+import math
+import os
+import pickle
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from dateutil.relativedelta import relativedelta
 
-from pylan import Add, Granularity, Item, Multiply, Replace
-from pylan.schedule import timedelta_from_schedule
+from pylan import (
+    Add,
+    Crossing,
+    Divide,
+    Drawdown,
+    Engine,
+    Every,
+    Granularity,
+    Inflow,
+    Item,
+    Min,
+    Multiply,
+    OnChange,
+    Outflow,
+    Output,
+    PeriodEnd,
+    Portfolio,
+    Profiler,
+    Replace,
+    Result,
+    Sample,
+    Subtract,
+    Transfer,
+)
+from pylan.distributions import Normal, Uniform
+from pylan.schedule import (
+    iter_schedule,
+    schedule_cache,
+    timedelta_from_schedule,
+    valid_cron,
+)
+from pylan.sinks import CallbackSink, CsvSink, MappedSink, NpySink
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class TestTimeDelta(unittest.TestCase):
@@ -83,6 +123,103 @@ class TestTimeDelta(unittest.TestCase):
             ),
         )
 
+    def test_cron_schedule_fields(self):
+        self.assertEqual(
+            timedelta_from_schedule(
+                "30 9-17/4 * feb mon", datetime(2024, 2, 1), datetime(2024, 2, 13)
+            ),
+            [
+                datetime(2024, 2, 5, 9, 30),
+                datetime(2024, 2, 5, 13, 30),
+                datetime(2024, 2, 5, 17, 30),
+                datetime(2024, 2, 12, 9, 30),
+                datetime(2024, 2, 12, 13, 30),
+                datetime(2024, 2, 12, 17, 30),
+            ],
+        )
+        self.assertEqual(
+            timedelta_from_schedule("0 0 1,15 * 7", datetime(2024, 1, 1), datetime(2025, 1, 1)),
+            [
+                datetime(2024, 9, 1),
+                datetime(2024, 9, 15),
+                datetime(2024, 12, 1),
+                datetime(2024, 12, 15),
+            ],
+        )
+
+    def test_valid_cron(self):
+        self.assertTrue(valid_cron("*/15 0 1-7 * 1-5"))
+        self.assertFalse(valid_cron("1m"))
+        self.assertFalse(valid_cron("61 * * * *"))
+        self.assertFalse(valid_cron("* * * * 8"))
+        self.assertFalse(valid_cron(["2024-1-1"]))
+
+    def test_unbounded_schedule(self):
+        dates = iter_schedule("0 0 2 * *", datetime(2024, 1, 1))
+        self.assertEqual(next(dates), datetime(2024, 1, 2))
+        self.assertEqual(next(dates), datetime(2024, 2, 2))
+        dates = iter_schedule(["1d", "2d"], datetime(2024, 1, 1), include_start=True)
+        self.assertEqual(
+            [next(dates) for _ in range(4)],
+            [
+                datetime(2024, 1, 1),
+                datetime(2024, 1, 2),
+                datetime(2024, 1, 4),
+                datetime(2024, 1, 5),
+            ],
+        )
+
+
+class TestScheduleCache(unittest.TestCase):
+    def setUp(self):
+        schedule_cache.clear()
+
+    def tearDown(self):
+        schedule_cache.resize(100000)
+
+    def test_shared_between_items(self):
+        for _ in range(3):
+            savings = Item(start_value=100)
+            savings.add_projections([Add("1d", 10), Multiply("0 0 1 * *", 1.01)])
+            savings.run("2024-1-1", "2025-1-1")
+        self.assertEqual(schedule_cache.stats["misses"], 2)
+        self.assertEqual(schedule_cache.stats["hits"], 4)
+        self.assertEqual(schedule_cache.stats["dates"], 366 + 11)
+
+    def test_unaligned_end(self):
+        salary = Add("1m", 2500)
+        salary.add_projection(Multiply("1y", 1.2))
+        savings = Item(start_value=100)
+        savings.add_projection(salary)
+        results = [savings.run("2024-1-1", "2025-3-15") for _ in range(3)]
+        self.assertEqual(schedule_cache.stats["misses"], 2)
+        self.assertEqual(schedule_cache.stats["hits"], 4)
+        schedule_cache.resize(0)
+        self.assertEqual(savings.run("2024-1-1", "2025-3-15"), results[0])
+        self.assertEqual(results[2], results[0])
+
+    def test_resize(self):
+        timedelta_from_schedule("1d", datetime(2024, 1, 1), datetime(2024, 2, 1))
+        timedelta_from_schedule("1h", datetime(2024, 1, 1), datetime(2024, 1, 2))
+        schedule_cache.resize(30)
+        self.assertEqual(schedule_cache.stats["entries"], 1)
+        self.assertEqual(schedule_cache.stats["evictions"], 1)
+        self.assertEqual(
+            len(timedelta_from_schedule("1h", datetime(2024, 1, 1), datetime(2024, 1, 2))),
+            24,
+        )
+        self.assertEqual(schedule_cache.stats["hits"], 1)
+
+    def test_streamed(self):
+        dates = iter_schedule("1h", datetime(2024, 1, 1), datetime(3024, 1, 1))
+        self.assertEqual(next(dates), datetime(2024, 1, 1, 1))
+        self.assertEqual(schedule_cache.stats["entries"], 0)
+        january = (datetime(2024, 1, 1), datetime(2024, 2, 1))
+        days = list(iter_schedule("1d", *january))
+        self.assertEqual(list(iter_schedule("1d", *january)), days)
+        self.assertEqual(schedule_cache.stats["dates"], 31)
+        self.assertEqual(schedule_cache.stats["hits"], 1)
+
 
 class TestProjections(unittest.TestCase):
     def test_basic_addition(self):
@@ -125,6 +262,22 @@ class TestProjections(unittest.TestCase):
         start.add_projection(adds)
         self.assertEqual(start.run(datetime(2024, 5, 1), datetime(2024, 5, 10)).final, 47)
 
+    def test_nested_value_timeline(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_payments.add_projection(Multiply("1y", 1.1))
+        salary_payments.add_projection(Add("2w", 5))
+        salary_payments.add_projection(Divide("0 0 1 * *", 1.001))
+        savings.add_projection(salary_payments)
+        result = savings.run("2024-1-31", "2027-1-31", Granularity.month)
+        event = savings.run(
+            "2024-1-31", "2027-1-31", Granularity.month, Engine.event, dense=True
+        )
+        self.assertEqual(result, event)
+        iterator = savings.iterate("2024-1-31", None, Granularity.month)
+        values = [context.value for _, (_, context) in zip(result.schedule, iterator)]
+        self.assertEqual(values, result.values)
+
     def test_offset(self):
         test = Add("1m", 1, offset="1m", include_start=True)
         savings = Item(start_value=100)
@@ -155,6 +308,50 @@ class TestItems(unittest.TestCase):
         savings.add_projections([dividends])
         self.assertEqual(savings.until(10000), relativedelta(days=60))
 
+    def test_until_long_horizon(self):
+        savings = Item(start_value=1000)
+        savings.add_projections([Add("1d", 5), Multiply("1y", 1.03)])
+        savings.run("2024-1-1", "2025-1-1")
+        self.assertEqual(savings.until(100000, "2024-1-1"), relativedelta(days=11688))
+
+    def test_until_cron(self):
+        for schedule, amount, days in [("0 0 * * *", 10, 501), ("0 0 2 * *", 300, 487)]:
+            savings = Item(start_value=0)
+            savings.add_projection(Add(schedule, amount))
+            self.assertEqual(savings.until(5000, "2024-1-1"), relativedelta(days=days))
+            result = savings.run("2024-1-1", "2025-12-31")
+            reached = datetime(2024, 1, 1) + relativedelta(days=days)
+            self.assertGreater(result[reached], 5000)
+            self.assertLessEqual(result[reached - relativedelta(days=1)], 5000)
+
+    def test_year_granularity(self):
+        savings = Item(start_value=100)
+        savings.add_projection(Multiply("1y", 2))
+        self.assertEqual(savings.granularity, Granularity.year)
+        result = savings.run("2024-1-1", "2030-1-1")
+        self.assertEqual(len(result), 7)
+        self.assertEqual(result.final, 6400)
+
+    def test_concurrent_runs(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_payments.add_projection(Multiply("1y", 1.2))
+        mortgage = Subtract("0 0 2 * *", 1500)
+        savings.add_projections([salary_payments, mortgage])
+        other = Item(start_value=5)
+        other.add_projections([mortgage])
+        expected = savings.run("2024-1-1", "2034-1-1")
+        expected_other = other.run("2024-1-1", "2034-1-1")
+        with ThreadPoolExecutor(8) as pool:
+            runs = [
+                pool.submit((savings if i % 2 else other).run, "2024-1-1", "2034-1-1")
+                for i in range(16)
+            ]
+        for i, run in enumerate(runs):
+            self.assertEqual(run.result(), expected if i % 2 else expected_other)
+        self.assertEqual(savings.start_value, 100)
+        self.assertFalse(hasattr(savings, "value"))
+
     def test_multiple_runs(self):
         savings = Item(start_value=100)
         salary_payments = Add("1m", 2500, offset="24d")
@@ -181,6 +378,576 @@ class TestItems(unittest.TestCase):
             test.append((date, saved.value))
         self.assertEqual(len(test), 92)
 
+    def test_unbounded_item_iterator(self):
+        savings = Item(start_value=100)
+        savings.add_projection(Add("1m", 2500, offset="24d"))
+        for date, saved in savings.iterate("2024-1-1", None, Granularity.day):
+            if saved.value > 100000:
+                break
+        self.assertEqual(date, datetime(2027, 5, 26))
+        self.assertEqual(saved.states[0].next_date, datetime(2027, 6, 25))
+
+
+class TestResult(unittest.TestCase):
+    def test_lookup(self):
+        savings = Item(start_value=100)
+        savings.add_projection(Add("1m", 10))
+        for granularity in [Granularity.hour, Granularity.month]:
+            result = savings.run("2024-1-1", "2026-1-1", granularity)
+            self.assertEqual(result["2024-3-1"], 120)
+            self.assertEqual(result[datetime(2025, 12, 1)], 330)
+            with self.assertRaises(Exception):
+                result["2027-1-1"]
+        result = Result([datetime(2024, 1, 3), datetime(2024, 1, 1)], [1, 2])
+        self.assertEqual(result["2024-1-1"], 2)
+
+    def test_slice(self):
+        savings = Item(start_value=100)
+        savings.add_projection(Add("1d", 1))
+        result = savings.run("2024-1-1", "2025-1-1")
+        january = result["2024-1-1":"2024-1-31"]
+        self.assertEqual(len(january), 31)
+        self.assertEqual(january.final, 130)
+        self.assertEqual(january["2024-1-10"], 109)
+        self.assertEqual(len(result["2024-12-25":]), 8)
+        with self.assertRaises(Exception):
+            january.add_result(datetime(2024, 2, 1), 131)
+
+    def test_add_to_sliced(self):
+        result = Result([datetime(2024, 1, day) for day in range(1, 5)], [1, 2, 3, 4])
+        view = result["2024-1-2":]
+        result.add_result(datetime(2024, 1, 5), 5)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view.final, 4)
+        self.assertEqual(result.final, 5)
+        self.assertEqual(result["2024-1-2"], 2)
+        with self.assertRaises(OverflowError):
+            result.add_result(datetime(2024, 1, 6), 10**400)
+        self.assertEqual(len(result.schedule), len(result.values))
+
+    @unittest.skipIf(numpy is None, "numpy not installed")
+    def test_arrays(self):
+        savings = Item(start_value=100)
+        savings.add_projection(Add("1d", 1))
+        dates, values = savings.run("2024-1-1", "2024-1-10")["2024-1-5":].arrays
+        self.assertEqual(dates[0], numpy.datetime64("2024-01-05"))
+        self.assertEqual(values.sum(), 104 + 105 + 106 + 107 + 108 + 109)
+
+    def test_resample(self):
+        savings = Item(start_value=100)
+        savings.add_projection(Add("1d", 1))
+        result = savings.run("2024-1-3", "2025-1-1")
+        monthly = result.resample(Granularity.month)
+        self.assertEqual(len(monthly), 13)
+        self.assertEqual(monthly.schedule[0], datetime(2024, 1, 1))
+        self.assertEqual(monthly["2024-1-1"], 128)
+        self.assertEqual(result.resample(Granularity.month, "first")["2024-2-1"], 129)
+        self.assertEqual(result.resample(Granularity.month, "sum")["2024-1-1"], 3306)
+        self.assertEqual(result.resample(Granularity.year, "mean").values, [281.5, 464])
+        self.assertEqual(result["2024-3-1":].resample(Granularity.week, "min").final, 462)
+        with self.assertRaises(Exception):
+            result.resample(Granularity.month, "median")
+
+    def test_rolling(self):
+        savings = Item(start_value=100)
+        savings.add_projection(Add("1d", 1))
+        result = savings.run("2024-1-1", "2024-2-1")
+        weekly = result.rolling(7)
+        self.assertEqual(weekly.schedule[0], datetime(2024, 1, 7))
+        self.assertEqual(weekly.values[:2], [103, 104])
+        self.assertEqual(result.rolling(3, "max")["2024-1-10"], 109)
+        self.assertEqual(result.rolling(3, "min")["2024-1-10"], 107)
+        self.assertEqual(len(result.rolling(40)), 0)
+        fractions = Result(
+            [datetime(2024, 1, day) for day in range(1, 29)],
+            [day * 0.1 + 1e6 * (day % 3) for day in range(1, 29)],
+        )
+        self.assertEqual(fractions.rolling(1).values, fractions.values)
+        self.assertEqual(fractions.rolling(1, "sum").values, fractions.values)
+        sums = fractions.rolling(5, "sum").values
+        means = fractions.rolling(5).values
+        for index, total in enumerate(sums):
+            self.assertEqual(total, math.fsum(fractions.values[index : index + 5]))
+            self.assertEqual(means[index], total / 5)
+        growth = result.growth(10)
+        self.assertEqual(growth.schedule[0], datetime(2024, 1, 11))
+        self.assertAlmostEqual(growth.values[0], 0.1)
+
+    def test_files(self):
+        savings = Item(start_value=100)
+        savings.add_projections([Add("1d", 1), Multiply("1m", 1.01)])
+        result = savings.run("2024-1-1", "2025-1-1")
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "result.csv")
+            result.to_csv(filename)
+            self.assertEqual(Result.from_csv(filename), result)
+            filename = os.path.join(directory, "result.res")
+            result["2024-6-1":].save(filename)
+            self.assertEqual(Result.load(filename), result["2024-6-1":])
+            mapped = Result.load(filename, mapped=True)
+            self.assertEqual(mapped["2024-7-1"], result["2024-7-1"])
+            self.assertEqual(mapped.final, result.final)
+            with self.assertRaises(Exception):
+                mapped.add_result(datetime(2025, 1, 2), 1)
+            with self.assertRaises(Exception):
+                Result.load(os.path.join(directory, "result.csv"))
+            del mapped
+
+    def test_str(self):
+        result = Result([datetime(2024, 1, day) for day in range(1, 13)], list(range(12)))
+        self.assertEqual(str(result).count("\n"), 12)
+        self.assertEqual(repr(result).split("\n")[5], "...")
+        self.assertEqual(repr(result).split("\n")[6], "7\t2024-01-08 00:00:00\t7.0")
+
+
+class TestEngines(unittest.TestCase):
+    def savings(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_increase = Multiply("1y", 1.2)
+        mortgage = Subtract("0 0 2 * *", 1500)
+        salary_payments.add_projection(salary_increase)
+        savings.add_projections([salary_payments, mortgage])
+        return savings
+
+    def test_event_engine_dense(self):
+        savings = self.savings()
+        loop = savings.run("2024-1-1", "2026-1-1", Granularity.day)
+        event = savings.run(
+            "2024-1-1", "2026-1-1", Granularity.day, engine=Engine.event, dense=True
+        )
+        self.assertEqual(loop.schedule, event.schedule)
+        self.assertEqual(loop.values, event.values)
+
+    def test_event_engine_dense_sink(self):
+        savings = self.savings()
+        loop = savings.run("2024-1-1", "2024-4-1", Granularity.hour)
+        rows = []
+        sink = CallbackSink(lambda dates, values: rows.extend(zip(dates, values)), 100)
+        options = {"engine": Engine.event, "dense": True, "sink": sink}
+        savings.run("2024-1-1", "2024-4-1", Granularity.hour, **options)
+        self.assertEqual(rows, list(zip(loop.schedule, loop.values)))
+
+    def test_event_engine_sparse(self):
+        savings = self.savings()
+        loop = savings.run("2024-1-1", "2026-1-1", Granularity.hour)
+        event = savings.run("2024-1-1", "2026-1-1", Granularity.hour, engine=Engine.event)
+        self.assertEqual(loop.final, event.final)
+        self.assertEqual(len(event.values), 49)
+        self.assertEqual(event.schedule[0], datetime(2024, 1, 1))
+        self.assertEqual(event.schedule[-1], datetime(2026, 1, 1))
+
+    @unittest.skipIf(numpy is None, "numpy not installed")
+    def test_vector_engine(self):
+        savings = self.savings()
+        savings.add_projections([Replace(["2025-6-1"], 0), Multiply("1w", 1.001)])
+        for granularity in [Granularity.hour, Granularity.day, Granularity.month]:
+            loop = savings.run("2024-1-1", "2026-1-1", granularity)
+            vector = savings.run("2024-1-1", "2026-1-1", granularity, engine=Engine.vector)
+            self.assertEqual(loop.schedule, vector.schedule)
+            self.assertEqual(loop.values, vector.values)
+
+
+class TestTimeline(unittest.TestCase):
+    def test_value_at(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_payments.add_projection(Multiply("1y", 1.2))
+        savings.add_projections([salary_payments, Subtract("0 0 2 * *", 1500)])
+        result = savings.run("2024-1-1", "2027-1-1")
+        timeline = savings.timeline("2024-1-1", "2027-1-1")
+        for date, value in zip(result.schedule[::17], result.values[::17]):
+            self.assertEqual(timeline.value_at(date), value)
+
+    def test_affine_between(self):
+        savings = Item(start_value=10)
+        savings.add_projections([Add("1d", 10), Multiply("3d", 2)])
+        timeline = savings.timeline("2024-5-1", "2024-5-10")
+        self.assertEqual(timeline.value_at("2024-5-10", start_value=100), 1220)
+        self.assertEqual(timeline.affine_between("2024-5-1", "2024-5-4"), (2, 60))
+        self.assertEqual(timeline.delta_between("2024-5-1", "2024-5-4"), 70)
+
+
+class TestSinks(unittest.TestCase):
+    def savings(self):
+        savings = Item(start_value=100)
+        savings.add_projections([Add("1d", 10), Multiply("1m", 1.01)])
+        return savings
+
+    def test_csv_sink(self):
+        savings = self.savings()
+        with tempfile.TemporaryDirectory() as directory:
+            expected = os.path.join(directory, "expected.csv")
+            streamed = os.path.join(directory, "streamed.csv")
+            savings.run("2024-1-1", "2025-1-1").to_csv(expected)
+            sink = CsvSink(streamed, batch_size=7)
+            self.assertIs(savings.run("2024-1-1", "2025-1-1", sink=sink), sink)
+            self.assertEqual(sink.rows, 367)
+            with open(expected) as a, open(streamed) as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_callback_sink(self):
+        savings = self.savings()
+        result = savings.run("2024-1-1", "2025-1-1")
+        for engine in [Engine.loop, Engine.event]:
+            batches = []
+            sink = CallbackSink(lambda dates, values: batches.append(values), 50)
+            savings.run("2024-1-1", "2025-1-1", engine=engine, dense=True, sink=sink)
+            self.assertEqual(max(len(batch) for batch in batches), 50)
+            self.assertEqual(sum(batches, []), result.values)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_npy_sink(self):
+        savings = self.savings()
+        result = savings.run("2024-1-1", "2025-1-1")
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "run.npy")
+            for engine in [Engine.loop, Engine.vector]:
+                sink = NpySink(filename, batch_size=100)
+                savings.run("2024-1-1", "2025-1-1", engine=engine, sink=sink)
+                array = numpy.load(filename)
+                self.assertEqual(array["value"].tolist(), result.values)
+                self.assertEqual(array["date"].tolist(), result.schedule)
+
+    def test_mapped_sink(self):
+        savings = self.savings()
+        result = savings.run("2024-1-1", "2025-1-1")
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "run.res")
+            sink = MappedSink(filename, chunk_size=10, batch_size=7)
+            savings.run("2024-1-1", "2025-1-1", sink=sink)
+            self.assertEqual(sink.result, result)
+            self.assertEqual(os.path.getsize(filename), 64 + 16 * len(result))
+            mapped = savings.run("2024-1-1", "2025-1-1", mapped=filename + "2")
+            self.assertEqual(list(mapped), list(result))
+            self.assertEqual(mapped["2024-6-1"], result["2024-6-1"])
+            self.assertEqual(mapped.plot_axes(), result.plot_axes())
+            with self.assertRaises(Exception):
+                savings.run("2024-1-1", "2025-1-1", sink=sink, mapped=filename)
+            del mapped
+
+
+class TestSimulation(unittest.TestCase):
+    def test_run_uses_mean(self):
+        savings = Item(start_value=100)
+        savings.add_projection(Add("1d", Uniform(5, 15)))
+        self.assertEqual(savings.run("2024-1-1", "2024-1-11").final, 200)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_deterministic_paths(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_payments.add_projection(Multiply("1y", 1.2))
+        savings.add_projections([salary_payments, Subtract("0 0 2 * *", 1500)])
+        result = savings.run("2024-1-1", "2027-1-1")
+        simulation = savings.simulate(3, "2024-1-1", "2027-1-1")
+        self.assertEqual(simulation.paths.shape, (len(result), 3))
+        for path in simulation.paths.T:
+            self.assertEqual(path.tolist(), result.values)
+        self.assertEqual(simulation.percentile(50), result)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_stochastic_paths(self):
+        savings = Item(start_value=0)
+        savings.add_projection(Add("1d", Normal(10, 2)))
+        simulation = savings.simulate(4000, "2024-1-1", "2024-4-10", seed=1)
+        summary = simulation.summary()
+        self.assertAlmostEqual(summary["mean"], 1000, delta=2)
+        self.assertAlmostEqual(summary["std"], 20, delta=1)
+        bands = simulation.bands((5, 50, 95))
+        self.assertLess(bands[5]["2024-3-1"], bands[50]["2024-3-1"])
+        self.assertLess(bands[50]["2024-3-1"], bands[95]["2024-3-1"])
+        again = savings.simulate(4000, "2024-1-1", "2024-4-10", seed=1)
+        self.assertEqual(again.final.tolist(), simulation.final.tolist())
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_distribution_seed(self):
+        savings = Item(start_value=100)
+        savings.add_projection(Multiply("1m", Normal(1.01, 0.05, seed=7)))
+        first = savings.simulate(100, "2024-1-1", "2026-1-1", seed=1).final
+        second = savings.simulate(100, "2024-1-1", "2026-1-1", seed=2).final
+        self.assertEqual(first.tolist(), second.tolist())
+        self.assertGreater(first.std(), 0)
+
+
+class TestSweep(unittest.TestCase):
+    def savings(self, increase, mortgage):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_increase = Multiply("1y", increase)
+        mortgage = Subtract("0 0 2 * *", mortgage)
+        salary_payments.add_projection(salary_increase)
+        savings.add_projections([salary_payments, mortgage])
+        return savings, salary_increase, mortgage
+
+    def test_sweep(self):
+        savings, salary_increase, mortgage = self.savings(1.2, 1500)
+        parameters = {
+            "increase": (salary_increase, [1.02, 1.1]),
+            "mortgage": (mortgage, [900]),
+        }
+        for executor in ["process", "thread"]:
+            sweep = savings.sweep(parameters, "2024-1-1", "2027-1-1", None, 2, executor)
+            self.assertEqual(sweep.combinations, [(1.02, 900), (1.1, 900)])
+            for parameters_, result in sweep:
+                expected = self.savings(parameters_["increase"], parameters_["mortgage"])
+                self.assertEqual(expected[0].run("2024-1-1", "2027-1-1"), result)
+        self.assertEqual(sweep[1.1, 900], sweep[{"increase": 1.1, "mortgage": 900}])
+        self.assertEqual(len(sweep.table()), 3)
+        expected = self.savings(1.2, 1500)[0].run("2024-1-1", "2027-1-1")
+        self.assertEqual(savings.run("2024-1-1", "2027-1-1"), expected)
+
+    def test_sweep_unknown_projection(self):
+        savings = self.savings(1.2, 1500)[0]
+        with self.assertRaises(Exception):
+            savings.sweep({"rent": (Add("1m", 10), [1, 2])}, "2024-1-1", "2025-1-1")
+
+
+class TestPlan(unittest.TestCase):
+    def test_run(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_payments.add_projection(Multiply("1y", 1.2))
+        mortgage = Subtract("0 0 2 * *", 1500)
+        savings.add_projections([salary_payments, mortgage])
+        plan = pickle.loads(pickle.dumps(savings.compile("2024-1-1", "2027-1-1")))
+        self.assertEqual(plan.run(), savings.run("2024-1-1", "2027-1-1"))
+        self.assertEqual(
+            plan.run(engine=Engine.event),
+            savings.run("2024-1-1", "2027-1-1", engine=Engine.event),
+        )
+        self.assertEqual(plan.slots[0], 100)
+
+        plan = savings.compile("2024-1-1", "2027-1-1")
+        result = plan.run(start_value=50, values={plan.slot(mortgage): 1200})
+        savings.start_value, mortgage.value = 50, 1200
+        self.assertEqual(result, savings.run("2024-1-1", "2027-1-1"))
+        with self.assertRaises(Exception):
+            plan.slot(Add("1m", 1))
+
+
+class TestPortfolio(unittest.TestCase):
+    def test_run(self):
+        checking = Item(start_value=1000)
+        checking.add_projections([Add("1m", 3000), Subtract("0 0 2 * *", 1500)])
+        savings = Item(start_value=0)
+        savings.add_projection(Multiply("1y", 1.05))
+        portfolio = Portfolio()
+        portfolio.add_items({"checking": checking, "savings": savings})
+        result = portfolio.run("2024-1-1", "2026-1-1", Granularity.day)
+        self.assertEqual(result["checking"], checking.run("2024-1-1", "2026-1-1"))
+        self.assertEqual(result["savings"].final, 0)
+
+        portfolio.add_transfer(Transfer("1m", 500, "checking", "savings"))
+        result = portfolio.run("2024-1-1", "2025-1-1")
+        self.assertEqual(result.final, {"checking": 13000, "savings": 5500 * 1.05 + 500})
+        self.assertEqual(result.total.final, 13000 + 5500 * 1.05 + 500)
+        self.assertEqual([name for name, _ in result], ["checking", "savings"])
+        with self.assertRaises(Exception):
+            portfolio.add_transfer(Transfer("1m", 500, "checking", "brokerage"))
+        with self.assertRaises(Exception):
+            Transfer("1m", 500, "checking", "savings").apply(checking)
+
+
+class TestIncremental(unittest.TestCase):
+    def test_update(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_payments.add_projection(Multiply("1y", 1.2))
+        mortgage = Subtract("0 0 2 * *", 1500)
+        savings.add_projections([salary_payments, mortgage])
+        run = savings.incremental("2024-1-1", "2034-1-1", Granularity.day)
+        self.assertEqual(run.result, savings.run("2024-1-1", "2034-1-1"))
+
+        late = Subtract("1m", 300, start_date="2030-1-1")
+        savings.add_projection(late)
+        self.assertEqual(run.update(), savings.run("2024-1-1", "2034-1-1"))
+        self.assertTrue(datetime(2030, 1, 1) < run.resumed_from <= datetime(2030, 2, 1))
+        late.value = 500
+        self.assertEqual(run.update(), savings.run("2024-1-1", "2034-1-1"))
+        mortgage.value = 1200
+        self.assertEqual(run.update(), savings.run("2024-1-1", "2034-1-1"))
+        self.assertEqual(run.resumed_from, datetime(2024, 1, 1))
+        savings.projections.remove(late)
+        self.assertEqual(run.update(), savings.run("2024-1-1", "2034-1-1"))
+        run.update()
+        self.assertIsNone(run.resumed_from)
+
+
+class TestBranch(unittest.TestCase):
+    def test_fork(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_payments.add_projection(Multiply("1y", 1.2))
+        rent = Subtract("0 0 2 * *", 1500)
+        savings.add_projections([salary_payments, rent])
+        root = savings.branch("2024-1-1", "2030-1-1", Granularity.day)
+        sale = Add(["2027-1-1"], 250000)
+        sell = root.fork("2027-1-1", add=[sale], remove=[rent])
+        invest = sell.fork("2028-1-1", add=[Multiply(["2028-1-1", "2029-1-1"], 1.05)])
+        keep = sell.fork("2028-1-1")
+        expected = savings.run("2024-1-1", "2030-1-1")
+        self.assertEqual(root.result, expected)
+        self.assertEqual(list(root.leaves()), [invest, keep])
+        self.assertEqual(sell.result["2026-12-31"], expected["2026-12-31"])
+
+        self.assertEqual(sell.result["2027-1-1"], expected["2027-1-1"] + 250000)
+        self.assertEqual(keep.result, sell.result)
+        self.assertEqual(invest.result["2027-12-31"], keep.result["2027-12-31"])
+        self.assertEqual(invest.result["2028-1-1"], keep.result["2028-1-1"] * 1.05)
+        with self.assertRaises(Exception):
+            sell.fork("2026-1-1")
+        with self.assertRaises(Exception):
+            sell.fork("2028-1-1", remove=[rent])
+
+
+class TestProfiler(unittest.TestCase):
+    def savings(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_payments.add_projection(Multiply("1y", 1.2))
+        savings.add_projections([salary_payments, Subtract("0 0 2 * *", 1500)])
+        return savings
+
+    def test_run(self):
+        savings = self.savings()
+        traced = []
+        profiler = Profiler(trace=lambda projection, old, new: traced.append(new))
+        result = savings.run("2024-1-1", "2026-1-1", profiler=profiler)
+        self.assertEqual(result, savings.run("2024-1-1", "2026-1-1"))
+        report = profiler.report()
+        self.assertEqual(list(report["phases"]), ["setup", "resolve", "run"])
+        rows = {row["name"]: row for row in report["projections"]}
+        events = len(savings.timeline("2024-1-1", "2026-1-1").ticks)
+        self.assertEqual(events, rows["Add(1m, 2500)"]["events"] + 24)
+        self.assertEqual(rows["Add(1m, 2500)"]["polls"], len(result))
+        self.assertEqual(rows["Add(1m, 2500)"]["updates"], 1)
+        self.assertEqual(rows["Subtract(0 0 2 * *, 1500)"]["events"], 24)
+        self.assertEqual(rows["Multiply(1y, 1.2)"]["depth"], 1)
+        self.assertEqual(rows["Multiply(1y, 1.2)"]["events"], 1)
+        self.assertEqual(traced[-1], result.final)
+        self.assertEqual(len(traced), events + 1)
+
+    def test_until_and_iterate(self):
+        savings = self.savings()
+        profiler = Profiler()
+        savings.until(10000, datetime(2024, 1, 1), profiler=profiler)
+        for _ in savings.iterate("2024-1-1", "2024-2-1", Granularity.day, profiler):
+            pass
+        self.assertEqual(len(profiler.projections), 6)
+        self.assertIn("Add(1m, 2500)", str(profiler))
+
+
+class TestOutput(unittest.TestCase):
+    def savings(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        savings.add_projections([salary_payments, Subtract("0 0 2 * *", 1500)])
+        return savings
+
+    def test_run(self):
+        savings = self.savings()
+        daily = savings.run("2024-1-1", "2034-1-1", Granularity.day)
+        monthly = savings.run(
+            "2024-1-1", "2034-1-1", Granularity.day, output=Granularity.month
+        )
+        monthly_run = savings.run("2024-1-1", "2034-1-1", Granularity.month)
+        self.assertEqual(monthly.schedule, monthly_run.schedule)
+        self.assertEqual([value for _, value in monthly], [daily[d] for d, _ in monthly])
+        self.assertGreater(len(daily), 30 * len(monthly))
+        with self.assertRaises(Exception):
+            savings.run("2024-1-1", "2034-1-1", output=Granularity.hour)
+
+    def test_policies(self):
+        savings = self.savings()
+        daily = savings.run("2024-1-1", "2024-4-1", Granularity.day)
+        changes = savings.run("2024-1-1", "2024-4-1", Granularity.day, output=OnChange())
+        self.assertEqual(changes.values, [100, -1400, -2900, -400, -1900, 600, 600])
+        for engine in [Engine.loop, Engine.event]:
+            result = savings.run(
+                "2024-1-1", "2024-4-1", Granularity.day, engine, output=OnChange()
+            )
+            self.assertEqual(result, changes)
+        month_ends = PeriodEnd(Granularity.month)
+        ends = savings.run("2024-1-1", "2024-4-1", Granularity.day, output=month_ends)
+        self.assertEqual([date.day for date in ends.schedule], [1, 31, 29, 31, 1])
+        self.assertEqual([value for _, value in ends], [daily[d] for d in ends.schedule])
+
+    def test_sink(self):
+        savings = self.savings()
+        month_ends = PeriodEnd(Granularity.month)
+        expected = savings.run("2024-1-1", "2025-1-1", Granularity.day, output=month_ends)
+        for engine in [Engine.loop, Engine.event]:
+            rows = []
+            sink = CallbackSink(lambda dates, values: rows.append(dates), batch_size=1)
+            options = {"sink": sink, "output": month_ends}
+            savings.run("2024-1-1", "2025-1-1", Granularity.day, engine, **options)
+            self.assertEqual(rows, [[date] for date in expected.schedule])
+            self.assertEqual(len(rows), 14)
+
+    def test_event_engine(self):
+        class Mondays(Output):
+            def selector(self, grid):
+                return lambda tick, value: grid[tick].weekday() == 0
+
+        savings = self.savings()
+        outputs = [Every(24), PeriodEnd(Granularity.week), Sample(Granularity.day)]
+        for output in outputs + [Mondays()]:
+            options = {"output": output}
+            loop = savings.run("2024-1-1", "2024-3-1", Granularity.hour, **options)
+            options["engine"] = Engine.event
+            event = savings.run("2024-1-1", "2024-3-1", Granularity.hour, **options)
+            self.assertEqual(event, loop)
+        self.assertIsNone(Mondays().next_tick(None))
+
+    def test_iterate(self):
+        savings = self.savings()
+        iterator = savings.iterate("2024-1-1", "2024-2-1", Granularity.day)
+        dates = [date for date, _ in iterator]
+        every = savings.iterate("2024-1-1", "2024-2-1", Granularity.day, output=Every(7))
+        self.assertEqual([date for date, _ in every], dates[::7])
+
+
+class TestReducers(unittest.TestCase):
+    def test_run(self):
+        savings = Item(start_value=100)
+        salary_payments = Add("1m", 2500, offset="24d")
+        salary_payments.add_projection(Multiply("1y", 1.2))
+        savings.add_projections([salary_payments, Subtract("0 0 2 * *", 1500)])
+        result = savings.run("2024-1-1", "2026-1-1", Granularity.day)
+        reducers = {
+            "lowest": Min(),
+            "broke": Crossing(0),
+            "rich": Crossing(10**6, below=False),
+            "drawdown": Drawdown(),
+            "income": Inflow(),
+        }
+        for engine in [Engine.loop, Engine.event]:
+            aggregates = savings.run(
+                "2024-1-1", "2026-1-1", Granularity.day, engine, reducers=reducers
+            )
+            self.assertEqual(aggregates["lowest"], min(result.values))
+            self.assertEqual(aggregates["broke"], datetime(2024, 1, 2))
+            self.assertIsNone(aggregates["rich"])
+            self.assertEqual(aggregates["drawdown"], 3000)
+            self.assertEqual(aggregates["income"], 2500 * 12 + 3000 * 11)
+        with self.assertRaises(Exception):
+            savings.run("2024-1-1", "2026-1-1", reducers={"lowest": min})
+        with self.assertRaises(Exception):
+            savings.run("2024-1-1", "2026-1-1", output=OnChange(), reducers=reducers)
+
+    def test_flows(self):
+        savings = Item(start_value=1000)
+        interest = Multiply("1m", 1.01)
+        savings.add_projections([Add("1m", 500), Subtract("1m", 500), interest])
+        reducers = {"income": Inflow(), "spent": Outflow()}
+        engines = [Engine.loop, Engine.event] + ([Engine.vector] if numpy else [])
+        for engine in engines:
+            aggregates = savings.run(
+                "2024-1-1", "2025-1-1", Granularity.day, engine, reducers=reducers
+            )
+            self.assertEqual(aggregates, {"income": 500 * 12, "spent": 500 * 12})
+
 
 if __name__ == "__main__":
     unittest.main()